@@ -2,12 +2,20 @@
 Banking Customer Support Agents Module
 """
 
-from .handlers import PositiveFeedbackAgent
-# from .handlers import NegativeFeedbackAgent  # TODO: Uncomment when implemented
-# from .handlers import QueryAgent  # TODO: Uncomment when implemented
+from .handlers import (
+    PositiveFeedbackAgent,
+    NegativeFeedbackAgent,
+    QueryAgent,
+    ResponseAgent,
+    EscalationAgent,
+    get_handler,
+)
 
 __all__ = [
     "PositiveFeedbackAgent",
-    # "NegativeFeedbackAgent",  # TODO: Uncomment when implemented
-    # "QueryAgent"  # TODO: Uncomment when implemented
+    "NegativeFeedbackAgent",
+    "QueryAgent",
+    "ResponseAgent",
+    "EscalationAgent",
+    "get_handler",
 ]
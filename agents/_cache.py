@@ -0,0 +1,93 @@
+"""
+Semantic response cache for agent LLM calls.
+Responses are keyed by the embedding of the prompt-relevant text; a lookup hits when a
+stored entry in the same namespace is within the cosine-similarity threshold.
+"""
+
+import threading
+import time
+
+import numpy as np
+
+# Default TTL for cached responses (7 days)
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+
+
+class SemanticCache:
+    """
+    In-process semantic cache. Entries are grouped by namespace (e.g. agent + model) so
+    responses from different agents never match each other.
+    """
+
+    def __init__(self, threshold: float = 0.92, ttl_seconds: int = DEFAULT_TTL_SECONDS, max_entries: int = 1000):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        # namespace -> {"vectors": np.ndarray (n, dim), "values": list, "expires": list}
+        self._namespaces = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        arr = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(arr)
+        return arr / norm if norm else arr
+
+    def _evict_expired(self, entry: dict, now: float) -> None:
+        keep = [i for i, expires in enumerate(entry["expires"]) if expires > now]
+        if len(keep) != len(entry["expires"]):
+            entry["vectors"] = entry["vectors"][keep]
+            entry["values"] = [entry["values"][i] for i in keep]
+            entry["expires"] = [entry["expires"][i] for i in keep]
+
+    def lookup(self, namespace: str, vector):
+        """
+        Return the cached value closest to ``vector`` if it clears the similarity threshold.
+
+        :param namespace: Cache partition (e.g. "PositiveFeedbackAgent:gpt-4o")
+        :param vector: Embedding of the lookup text
+        :return: Cached value or None on a miss
+        """
+        query = self._normalize(vector)
+        with self._lock:
+            entry = self._namespaces.get(namespace)
+            if not entry:
+                return None
+            self._evict_expired(entry, time.time())
+            if not entry["values"]:
+                return None
+            sims = entry["vectors"] @ query
+            best = int(np.argmax(sims))
+            if sims[best] >= self.threshold:
+                return entry["values"][best]
+        return None
+
+    def store(self, namespace: str, vector, value) -> None:
+        """
+        Add a value under ``namespace``. Once max_entries is reached expired entries are dropped
+        first, then the oldest one.
+        """
+        row = self._normalize(vector)[np.newaxis, :]
+        with self._lock:
+            entry = self._namespaces.get(namespace)
+            if entry is None:
+                self._namespaces[namespace] = {
+                    "vectors": row,
+                    "values": [value],
+                    "expires": [time.time() + self.ttl_seconds],
+                }
+                return
+            if len(entry["values"]) >= self.max_entries:
+                self._evict_expired(entry, time.time())
+            if len(entry["values"]) >= self.max_entries:
+                entry["vectors"] = entry["vectors"][1:]
+                entry["values"] = entry["values"][1:]
+                entry["expires"] = entry["expires"][1:]
+            entry["vectors"] = np.vstack([entry["vectors"], row])
+            entry["values"].append(value)
+            entry["expires"].append(time.time() + self.ttl_seconds)
+
+    def clear(self) -> None:
+        """Drop all cached entries."""
+        with self._lock:
+            self._namespaces.clear()
@@ -0,0 +1,95 @@
+"""
+OpenAI Batch API helpers for offline / bulk LLM work.
+Batched requests cost 50% less and run against a separate rate-limit pool, but results
+arrive within a completion window (up to 24 h) - never use this for interactive traffic.
+"""
+
+import json
+import logging
+import time
+from typing import Optional
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+COMPLETION_WINDOW = "24h"
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+log = logging.getLogger(__name__)
+
+
+def build_chat_request(custom_id: str, body: dict) -> dict:
+    """
+    Build one JSONL line of a chat-completions batch.
+
+    :param custom_id: ID used to join the result back to its input (must be unique in the batch)
+    :param body: Request body as it would be passed to chat.completions.create
+    :return: Batch request dict
+    """
+    return {"custom_id": custom_id, "method": "POST", "url": BATCH_ENDPOINT, "body": body}
+
+
+def submit_batch(client, requests: list) -> str:
+    """
+    Upload the requests as a JSONL file and start a batch.
+
+    :param client: OpenAI client
+    :param requests: Dicts from build_chat_request
+    :return: Batch ID
+    """
+    payload = "\n".join(json.dumps(request) for request in requests).encode("utf-8")
+    batch_file = client.files.create(file=("batch.jsonl", payload), purpose="batch")
+    batch = client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint=BATCH_ENDPOINT,
+        completion_window=COMPLETION_WINDOW,
+    )
+    log.info("[Batch] Submitted batch %s (%d requests)", batch.id, len(requests))
+    return batch.id
+
+
+def wait_for_batch(client, batch_id: str, poll_interval: int = 60, timeout: Optional[float] = None):
+    """
+    Poll a batch until it reaches a terminal status.
+
+    :param client: OpenAI client
+    :param batch_id: Batch ID from submit_batch
+    :param poll_interval: Seconds between status checks
+    :param timeout: Give up after this many seconds (None waits for the whole completion window)
+    :return: The final batch object
+    """
+    deadline = time.monotonic() + timeout if timeout else None
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        if batch.status in TERMINAL_STATUSES:
+            log.info("[Batch] Batch %s finished with status '%s'", batch_id, batch.status)
+            return batch
+        if deadline and time.monotonic() >= deadline:
+            raise TimeoutError(f"Batch {batch_id} still '{batch.status}' after {timeout}s")
+        time.sleep(poll_interval)
+
+
+def read_batch_results(client, batch) -> dict:
+    """
+    Download a finished batch's output and map custom_id -> message content.
+    Requests that errored are left out, so callers can fall back per item.
+
+    :param client: OpenAI client
+    :param batch: Batch object from wait_for_batch
+    :return: Dictionary of custom_id to stripped response text
+    """
+    if not batch.output_file_id:
+        return {}
+    results = {}
+    for line in client.files.content(batch.output_file_id).text.splitlines():
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        response = record.get("response") or {}
+        if response.get("status_code") != 200:
+            continue
+        try:
+            content = response["body"]["choices"][0]["message"]["content"]
+        except (KeyError, IndexError, TypeError):
+            continue
+        if content:
+            results[record["custom_id"]] = content.strip()
+    return results
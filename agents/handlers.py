@@ -3,40 +3,432 @@ Banking Customer Support Handlers
 Each handler is a specialized "agent" for a specific message type.
 """
 
-from typing import Optional
-
-from openai import OpenAI
+import asyncio
+import concurrent.futures
+import contextlib
+import contextvars
+import importlib.util
+import json
+import logging
+import random
+import re
+import textwrap
+import time
+from typing import Callable, Optional
+
+import httpx
+from openai import OpenAI, AsyncOpenAI, RateLimitError
 from dotenv import load_dotenv
 import os
-import sys
-from pathlib import Path
 from db.db_utils import TicketManager
-
-sys.path.insert(0, str(Path(__file__).parent.parent))
+from ._cache import SemanticCache
+from .batch import build_chat_request, submit_batch, wait_for_batch, read_batch_results
+from .parallel import BASE_BACKOFF_SECONDS
+
+__all__ = [
+    "PositiveFeedbackAgent",
+    "NegativeFeedbackAgent",
+    "QueryAgent",
+    "ResponseAgent",
+    "EscalationAgent",
+    "HANDLERS",
+    "get_handler",
+    "handle_concurrently",
+    "stream_response_to",
+]
 
 load_dotenv()
-client = OpenAI(api_key=os.getenv("PAID_OPENAI_API_KEY"))
 
-# Max prior turns to include as context (each turn = user + assistant). Keeps prompts within token limits.
-MAX_CONTEXT_TURNS = 5
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
+log = logging.getLogger(__name__)
+
+# One pooled HTTP client per process so bursts of agent calls reuse keep-alive connections
+# instead of paying a TCP/TLS handshake per request. HTTP/2 is used when the h2 extra is installed.
+# Idle connections are kept for 5 minutes so sustained traffic almost never opens a cold one.
+_HTTP2 = importlib.util.find_spec("h2") is not None
+_HTTP_LIMITS = httpx.Limits(max_keepalive_connections=100, max_connections=200, keepalive_expiry=300)
+_HTTP_TIMEOUT = httpx.Timeout(connect=5, read=60, write=30, pool=5)
+
+client = OpenAI(
+    api_key=os.getenv("PAID_OPENAI_API_KEY"),
+    http_client=httpx.Client(limits=_HTTP_LIMITS, timeout=_HTTP_TIMEOUT, http2=_HTTP2),
+    max_retries=2,
+)
+# Async client for callers that overlap several LLM calls (asyncio.gather over agents / tickets)
+async_client = AsyncOpenAI(
+    api_key=os.getenv("PAID_OPENAI_API_KEY"),
+    http_client=httpx.AsyncClient(
+        limits=_HTTP_LIMITS,
+        timeout=_HTTP_TIMEOUT,
+        http2=_HTTP2,
+    ),
+    max_retries=2,
+)
+# Extra retries of one completion on 429 beyond the SDK's own, with exponential backoff,
+# before the agent answers with its fallback text
+RATE_LIMIT_RETRIES = 3
+
+# Model per agent: gpt-4o-mini for short thank-yous / formatting / status updates, gpt-4o for
+# complaints. Override with AGENT_MODEL_<AGENT CLASS NAME>, e.g. AGENT_MODEL_QUERYAGENT=gpt-4o
+DEFAULT_MODEL = "gpt-4o"
+MODEL_BY_AGENT = {
+    name: os.getenv(f"AGENT_MODEL_{name.upper()}", model)
+    for name, model in {
+        "PositiveFeedbackAgent": "gpt-4o-mini",
+        "ResponseAgent": "gpt-4o-mini",
+        "EscalationAgent": "gpt-4o-mini",
+        "QueryAgent": "gpt-4o-mini",
+        "NegativeFeedbackAgent": "gpt-4o",
+    }.items()
+}
+
+# Semantic response cache for template-like replies (positive feedback); opt-in
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+EMBEDDING_MODEL = "text-embedding-3-small"
+# Responses sampled above this temperature vary too much to be reused from cache
+CACHE_MAX_TEMPERATURE = 0.3
+# PositiveFeedbackAgent samples at the cacheable temperature only while the cache is on
+POSITIVE_FEEDBACK_TEMPERATURE = CACHE_MAX_TEMPERATURE if SEMANTIC_CACHE_ENABLED else 0.7
+NAME_PLACEHOLDER = "{customer_name}"
+response_cache = SemanticCache(threshold=0.92)
+
+# Near-deterministic replies (short thank-yous, "please send your ticket number") are answered
+# from templates instead of an LLM round-trip unless this is enabled
+USE_LLM_FOR_TRIVIAL = os.getenv("USE_LLM_FOR_TRIVIAL", "false").lower() in ("1", "true", "yes")
+TRIVIAL_FEEDBACK_MAX_CHARS = 40
+_SENTENCE_BREAK_RE = re.compile(r"[.!?]+\s+\S")
+
+# How long QueryAgent waits on a ticket lookup before speculatively drafting the "not found" reply
+SPECULATIVE_LOOKUP_GRACE_SECONDS = 0.2
+
+# Ticket lookups started ahead of QueryAgent (QueryAgent.prefetch_lookup), e.g. while the
+# classifier is still streaming the rest of its answer
+_lookup_prefetcher = concurrent.futures.ThreadPoolExecutor(max_workers=8, thread_name_prefix="query-prefetch")
+
+# Token budget for prior conversation turns. Truncating by tokens rather than turn count keeps
+# one long message from blowing up latency/cost and keeps prompt lengths stable.
+MAX_HISTORY_TOKENS = 2000
+# Overall input budget (system + history + user message); history shrinks further to stay under it
+MAX_PROMPT_TOKENS = 6000
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.encoding_for_model("gpt-4o")
+except Exception:  # tiktoken missing or its encoding file unavailable: estimate instead
+    _ENCODING = None
+
+
+def _count_tokens(text: str) -> int:
+    """Token count of text for gpt-4o (~4 characters per token when tiktoken is unavailable)."""
+    if _ENCODING is None:
+        return len(text) // 4 + 1
+    return len(_ENCODING.encode(text))
 
 
 def _messages_with_history(system_content: str, user_content: str, state: dict):
-    """Build OpenAI messages list with optional conversation history for context."""
+    """
+    Build OpenAI messages list with optional conversation history for context.
+    History is trimmed from the middle until it fits MAX_HISTORY_TOKENS (and the prompt fits
+    MAX_PROMPT_TOKENS); the first turn is always kept so the start of the prompt stays the
+    same across a session.
+    """
     history = state.get("conversation_history") or []
     if not isinstance(history, list):
         history = []
-    # Take the most recent turns to avoid token overflow
-    max_messages = MAX_CONTEXT_TURNS * 2  # user + assistant per turn
-    history = history[-max_messages:] if len(history) > max_messages else history
+    history = [
+        {"role": msg["role"], "content": msg["content"]}
+        for msg in history
+        if isinstance(msg, dict) and msg.get("role") in ("user", "assistant") and msg.get("content")
+    ]
+    system_tokens = _SYSTEM_PROMPT_TOKENS.get(system_content)
+    if system_tokens is None:
+        system_tokens = _count_tokens(system_content)
+    budget = min(MAX_HISTORY_TOKENS, MAX_PROMPT_TOKENS - system_tokens - _count_tokens(user_content))
+    token_counts = [_count_tokens(msg["content"]) for msg in history]
+    total = sum(token_counts)
+    while total > budget and len(history) > 1:
+        # Drop the oldest message after the first one
+        history.pop(1)
+        total -= token_counts.pop(1)
     messages = [{"role": "system", "content": system_content}]
-    for msg in history:
-        if isinstance(msg, dict) and msg.get("role") in ("user", "assistant") and msg.get("content"):
-            messages.append({"role": msg["role"], "content": msg["content"]})
+    messages.extend(history)
     messages.append({"role": "user", "content": user_content})
     return messages
 
 
+# Consumer of the user-facing response as it is generated (set via stream_response_to).
+# Only ResponseAgent streams: every handler's output is rewritten by it before reaching the user.
+response_stream: contextvars.ContextVar[Optional[Callable[[str], None]]] = contextvars.ContextVar(
+    "response_stream", default=None
+)
+
+
+@contextlib.contextmanager
+def stream_response_to(on_delta: Callable[[str], None]):
+    """
+    Stream the formatted response to ``on_delta`` (called with each text fragment) while
+    the workflow runs inside this block, e.g. to render tokens as soon as they arrive.
+    """
+    token = response_stream.set(on_delta)
+    try:
+        yield
+    finally:
+        response_stream.reset(token)
+
+
+def _rate_limit_backoff(attempt: int) -> float:
+    """Seconds to wait before retrying a rate-limited completion (exponential with jitter)."""
+    return BASE_BACKOFF_SECONDS * (2 ** attempt) + random.uniform(0, 1)
+
+
+def _complete(agent_name: str, messages: list, max_tokens: int, fallback: str,
+              model: Optional[str] = None, temperature: float = 0.7,
+              on_delta: Optional[Callable[[str], None]] = None) -> str:
+    """
+    Run a chat completion for an agent; returns the fallback text if the call fails.
+    A rate-limited (429) call is retried with backoff up to RATE_LIMIT_RETRIES times first.
+    When on_delta is given the completion is streamed and each fragment is passed to it.
+    """
+    model = model or MODEL_BY_AGENT.get(agent_name, DEFAULT_MODEL)
+    try:
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+            try:
+                completion = client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    stream=on_delta is not None,
+                )
+                break
+            except RateLimitError:
+                if attempt == RATE_LIMIT_RETRIES:
+                    raise
+                time.sleep(_rate_limit_backoff(attempt))
+        if on_delta is None:
+            response = completion.choices[0].message.content.strip()
+        else:
+            parts = []
+            for chunk in completion:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    parts.append(delta)
+                    on_delta(delta)
+            response = "".join(parts).strip()
+        log.debug("[%s] AI-generated response created", agent_name)
+        return response
+    except Exception as e:
+        log.warning("[%s] OpenAI call failed: %s", agent_name, e)
+        return fallback
+
+
+async def _acomplete(agent_name: str, messages: list, max_tokens: int, fallback: str,
+                     model: Optional[str] = None, temperature: float = 0.7,
+                     on_delta: Optional[Callable[[str], None]] = None) -> str:
+    """
+    Async version of _complete using the shared AsyncOpenAI client. The 429 backoff only retries
+    this one call, so a node that already wrote (e.g. created a ticket) is never re-run.
+    """
+    model = model or MODEL_BY_AGENT.get(agent_name, DEFAULT_MODEL)
+    try:
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+            try:
+                completion = await async_client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    stream=on_delta is not None,
+                )
+                break
+            except RateLimitError:
+                if attempt == RATE_LIMIT_RETRIES:
+                    raise
+                await asyncio.sleep(_rate_limit_backoff(attempt))
+        if on_delta is None:
+            response = completion.choices[0].message.content.strip()
+        else:
+            parts = []
+            async for chunk in completion:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    parts.append(delta)
+                    on_delta(delta)
+            response = "".join(parts).strip()
+        log.debug("[%s] AI-generated response created", agent_name)
+        return response
+    except Exception as e:
+        log.warning("[%s] OpenAI call failed: %s", agent_name, e)
+        return fallback
+
+
+def _cache_text(state: dict) -> str:
+    """Text that identifies a cacheable request: the topic plus the customer's message."""
+    return f"{state.get('extracted_topic', '')}\n{state.get('user_input', '')}"
+
+
+def _cache_hit(agent_name: str, namespace: str, vector, customer_name: str) -> Optional[str]:
+    """Look up a cached response template and fill in this customer's name."""
+    template = response_cache.lookup(namespace, vector)
+    if template is None:
+        return None
+    log.debug("[%s] Semantic cache hit", agent_name)
+    return template.replace(NAME_PLACEHOLDER, customer_name)
+
+
+def _cache_store(namespace: str, vector, customer_name: str, response: str) -> None:
+    """
+    Store a response with the customer's full name replaced by a placeholder. Replies that still
+    mention any part of the name (e.g. "Dear John") are not stored, so a later cache hit can never
+    greet another customer by this one's name.
+    """
+    if customer_name:
+        response = re.sub(rf"\b{re.escape(customer_name)}\b", NAME_PLACEHOLDER, response, flags=re.IGNORECASE)
+        for part in customer_name.split():
+            if re.search(rf"\b{re.escape(part)}\b", response, flags=re.IGNORECASE):
+                log.debug("[SemanticCache] Reply still mentions the customer's name, not caching it")
+                return
+    response_cache.store(namespace, vector, response)
+
+
+def _cached_complete(agent_name: str, state: dict, messages: list, max_tokens: int, fallback: str,
+                     model: Optional[str] = None, temperature: float = 0.7) -> str:
+    """
+    _complete behind the semantic response cache. The cache is keyed on topic plus message only,
+    so it is skipped for high-temperature calls and for turns with conversation history.
+    """
+    model = model or MODEL_BY_AGENT.get(agent_name, DEFAULT_MODEL)
+    if not SEMANTIC_CACHE_ENABLED or temperature > CACHE_MAX_TEMPERATURE or state.get("conversation_history"):
+        return _complete(agent_name, messages, max_tokens, fallback, model=model, temperature=temperature)
+
+    namespace = f"{agent_name}:{model}"
+    customer_name = state.get("customer_name", "")
+    try:
+        vector = client.embeddings.create(model=EMBEDDING_MODEL, input=_cache_text(state)).data[0].embedding
+    except Exception as e:
+        log.warning("[%s] Embedding failed, skipping cache: %s", agent_name, e)
+        return _complete(agent_name, messages, max_tokens, fallback, model=model, temperature=temperature)
+
+    cached = _cache_hit(agent_name, namespace, vector, customer_name)
+    if cached is not None:
+        return cached
+    response = _complete(agent_name, messages, max_tokens, fallback, model=model, temperature=temperature)
+    if response != fallback:
+        _cache_store(namespace, vector, customer_name, response)
+    return response
+
+
+async def _acached_complete(agent_name: str, state: dict, messages: list, max_tokens: int, fallback: str,
+                            model: Optional[str] = None, temperature: float = 0.7) -> str:
+    """Async version of _cached_complete."""
+    model = model or MODEL_BY_AGENT.get(agent_name, DEFAULT_MODEL)
+    if not SEMANTIC_CACHE_ENABLED or temperature > CACHE_MAX_TEMPERATURE or state.get("conversation_history"):
+        return await _acomplete(agent_name, messages, max_tokens, fallback, model=model, temperature=temperature)
+
+    namespace = f"{agent_name}:{model}"
+    customer_name = state.get("customer_name", "")
+    try:
+        embedding = await async_client.embeddings.create(model=EMBEDDING_MODEL, input=_cache_text(state))
+        vector = embedding.data[0].embedding
+    except Exception as e:
+        log.warning("[%s] Embedding failed, skipping cache: %s", agent_name, e)
+        return await _acomplete(agent_name, messages, max_tokens, fallback, model=model, temperature=temperature)
+
+    cached = _cache_hit(agent_name, namespace, vector, customer_name)
+    if cached is not None:
+        return cached
+    response = await _acomplete(agent_name, messages, max_tokens, fallback, model=model, temperature=temperature)
+    if response != fallback:
+        _cache_store(namespace, vector, customer_name, response)
+    return response
+
+
+async def handle_concurrently(state: dict, *agents) -> list:
+    """
+    Run several independent agents against the same state, overlapping their LLM calls.
+
+    :param state: Current workflow state
+    :param agents: Agent classes exposing an async ``ahandle(state)``
+    :return: List of each agent's result dict, in the order given
+    """
+    return await asyncio.gather(*(agent.ahandle(state) for agent in agents))
+
+
+FALLBACK_FEEDBACK = "I'm sorry, but I'm currently unable to process your feedback. Please try again later."
+FALLBACK_REQUEST = "I'm sorry, but I'm currently unable to process your request. Please try again later."
+
+TEMPLATE_THANKS = "Thank you so much, {customer_name}! We really appreciate your kind words about {topic}."
+TEMPLATE_THANKS_NO_TOPIC = "Thank you so much, {customer_name}! We really appreciate your kind words."
+TEMPLATE_NO_TICKET = (
+    "Hi {customer_name}, I couldn't find any tickets under your customer ID or name. "
+    "Could you please share the 6-digit ticket number you received when the issue was reported?"
+)
+
+
+# ============================================================================
+# SYSTEM PROMPTS
+# Static and byte-identical on every call so the provider can cache the prompt prefix.
+# Per-request fields (names, ticket IDs, messages) only ever go in the final user message.
+# ============================================================================
+
+_POSITIVE_SYSTEM_PROMPT = textwrap.dedent("""\
+    You are a friendly banking customer support agent responding to positive feedback.
+    Generate a warm, professional, and appreciative response that:
+    - Thanks the customer by name
+    - Acknowledges their specific feedback
+    - Expresses genuine appreciation
+    - Keeps the tone professional but friendly
+    - Keeps the response concise (2-3 sentences)""").strip()
+
+_NEGATIVE_SYSTEM_PROMPT = textwrap.dedent("""\
+    You are a compassionate banking customer support agent responding to a customer's complaint.
+    Generate a warm, empathetic, and reassuring response that:
+    - Acknowledges the customer's feelings and specific issue
+    - Apologizes for their negative experience
+    - Informs them that a support ticket has been created to address their issue
+    - Provides a ticket number for reference
+    - Addresses the customer by name
+    - Keeps the tone professional but empathetic
+    - Keeps the response concise (3-4 sentences)""").strip()
+
+_QUERY_SYSTEM_PROMPT = textwrap.dedent("""\
+    You are a friendly banking customer support agent responding to a ticket status query.
+    - If you are given ticket information below: give a professional, concise status update using the status, dates, and issue. If multiple tickets are listed, summarize each briefly. For status 'in_progress', add that the team is working on it and typical resolution is within 24-48 hours if not already stated.
+    - If no ticket information is given (e.g. no ticket found for customer ID or name): ask them to provide the 6-digit ticket number they received when the issue was reported.
+    - If the customer provided a ticket number but no ticket was found: politely say that no ticket was found for that number and suggest they check the number or contact support.
+    Use the customer's name. Keep the response to 2-4 sentences (or a bit more if summarizing multiple tickets).""").strip()
+
+_RESPONSE_SYSTEM_PROMPT = textwrap.dedent("""\
+    You are a friendly banking customer agent that formats a response for the user.
+    You will receive a response from another agent. Your job is to format it as a single, clean message for the customer.
+
+    Rules:
+    - Output ONLY the message text. Do not wrap in JSON. Do not use a "response" key or any labels.
+    - Use real line breaks between paragraphs.
+    - Always end with: Best regards, Conleth Stead, Banking AI Agent""").strip()
+
+_ESCALATION_SYSTEM_PROMPT = textwrap.dedent("""\
+    You are a friendly banking customer support agent escalating the interaction to a human agent.
+    Generate a warm, professional, and reassuring response that:
+    - Thanks the customer by name
+    - Acknowledges their specific feedback
+    - Expresses genuine appreciation
+    - Keeps the tone professional but friendly
+    - Keeps the response concise (2-3 sentences)""").strip()
+
+# Token counts of the static prompts, computed once so per-call budgeting only encodes the dynamic parts
+_SYSTEM_PROMPT_TOKENS = {
+    prompt: _count_tokens(prompt)
+    for prompt in (
+        _POSITIVE_SYSTEM_PROMPT,
+        _NEGATIVE_SYSTEM_PROMPT,
+        _QUERY_SYSTEM_PROMPT,
+        _RESPONSE_SYSTEM_PROMPT,
+        _ESCALATION_SYSTEM_PROMPT,
+    )
+}
+
+
 # ============================================================================
 # POSITIVE FEEDBACK AGENT
 # ============================================================================
@@ -48,49 +440,80 @@ class PositiveFeedbackAgent:
     """
 
     @staticmethod
-    def handle(state: dict) -> dict:
-        """
-        Process positive feedback.
-
-        :param state: Current workflow state
-        :return: Dictionary with response updates
-        """
-        print("😊 [PositiveFeedbackAgent] Processing positive feedback...")
-
+    def _messages(state: dict) -> list:
+        """Build the LLM messages for a positive feedback response."""
         customer_name = state["customer_name"]
         extracted_topic = state["extracted_topic"]
         user_input = state["user_input"]
 
         # Use OpenAI to generate a personalized thank you response
-        system_prompt = """You are a friendly banking customer support agent responding to positive feedback.
-        Generate a warm, professional, and appreciative response that:
-        - Thanks the customer by name
-        - Acknowledges their specific feedback
-        - Expresses genuine appreciation
-        - Keeps the tone professional but friendly
-        - Keeps the response concise (2-3 sentences)"""
+        user_prompt = (
+            f"Customer name: {customer_name}\n"
+            f"Topic they mentioned: {extracted_topic}\n"
+            f"Their message: {user_input}\n\n"
+            "Generate a thank you response."
+        )
+
+        return _messages_with_history(_POSITIVE_SYSTEM_PROMPT, user_prompt, state)
 
-        user_prompt = f"""Customer name: {customer_name}
-        Topic they mentioned: {extracted_topic}
-        Their message: {user_input}
+    @staticmethod
+    def _template_response(state: dict) -> Optional[str]:
+        """
+        Templated thank-you for short, single-sentence feedback with no specifics (e.g. "Thanks!").
+        Returns None when the message needs an LLM reply.
+        """
+        if USE_LLM_FOR_TRIVIAL:
+            return None
+        user_input = state["user_input"].strip()
+        if len(user_input) >= TRIVIAL_FEEDBACK_MAX_CHARS or any(ch.isdigit() for ch in user_input):
+            return None
+        if _SENTENCE_BREAK_RE.search(user_input):
+            return None
+        topic = (state.get("extracted_topic") or "").strip()
+        template = TEMPLATE_THANKS if topic else TEMPLATE_THANKS_NO_TOPIC
+        return template.format(customer_name=state["customer_name"], topic=topic)
 
-        Generate a thank you response."""
+    @staticmethod
+    def handle(state: dict) -> dict:
+        """
+        Process positive feedback.
 
-        try:
-            messages = _messages_with_history(system_prompt, user_prompt, state)
-            completion = client.chat.completions.create(
-                model="gpt-4o",
-                messages=messages,
-                temperature=0.7,
-                max_tokens=150
+        :param state: Current workflow state
+        :return: Dictionary with response updates
+        """
+        log.debug("[PositiveFeedbackAgent] Processing positive feedback...")
+
+        response = PositiveFeedbackAgent._template_response(state)
+        if response is None:
+            response = _cached_complete(
+                "PositiveFeedbackAgent",
+                state,
+                PositiveFeedbackAgent._messages(state),
+                max_tokens=150,
+                fallback=FALLBACK_FEEDBACK,
+                temperature=POSITIVE_FEEDBACK_TEMPERATURE,
             )
 
-            response = completion.choices[0].message.content.strip()
-            print(f"✅ [PositiveFeedbackAgent] AI-generated response created!")
+        return {
+            "response": response,
+            "agent_name": "PositiveFeedbackAgent"
+        }
 
-        except Exception as e:
-            print(f"❌ [PositiveFeedbackAgent] OpenAI call failed: {str(e)}")
-            response = "I'm sorry, but I'm currently unable to process your feedback. Please try again later."
+    @staticmethod
+    async def ahandle(state: dict) -> dict:
+        """Async version of handle()."""
+        log.debug("[PositiveFeedbackAgent] Processing positive feedback...")
+
+        response = PositiveFeedbackAgent._template_response(state)
+        if response is None:
+            response = await _acached_complete(
+                "PositiveFeedbackAgent",
+                state,
+                PositiveFeedbackAgent._messages(state),
+                max_tokens=150,
+                fallback=FALLBACK_FEEDBACK,
+                temperature=POSITIVE_FEEDBACK_TEMPERATURE,
+            )
 
         return {
             "response": response,
@@ -108,57 +531,67 @@ class NegativeFeedbackAgent:
     """
 
     @staticmethod
-    def handle(state: dict) -> dict:
-        """
-        Process negative feedback and create a support ticket.
-
-        :param state: Current workflow state
-        :return: Dictionary with response and ticket info
-        """
-        print("😔 [NegativeFeedbackAgent] Processing complaint...")
+    def _create_ticket(state: dict) -> str:
+        """Create the support ticket for this complaint and return its ID."""
+        return TicketManager.create_ticket(
+            customer_id=state["customer_id"],
+            customer_name=state["customer_name"],
+            message_content=state["user_input"],
+            classification="negative_feedback"
+        )
 
-        customer_id = state["customer_id"]
+    @staticmethod
+    def _messages(state: dict, ticket_id: str) -> list:
+        """Build the LLM messages for a complaint response referencing the new ticket."""
         customer_name = state["customer_name"]
         user_input = state["user_input"]
         extracted_topic = state["extracted_topic"]
 
-        ticket_id = TicketManager.create_ticket(
-            customer_id=customer_id,
-            customer_name=customer_name,
-            message_content=user_input,
-            classification="negative_feedback"
+        user_prompt = (
+            f"Customer name: {customer_name}\n"
+            f"Topic they mentioned: {extracted_topic}\n"
+            f"Their complaint: {user_input}\n"
+            f"Their ticket ID: {ticket_id}"
         )
 
-        system_prompt = """You are a compassionate banking customer support agent responding to a customer's complaint.
-        Generate a warm, empathetic, and reassuring response that:
-        - Acknowledges the customer's feelings and specific issue
-        - Apologizes for their negative experience
-        - Informs them that a support ticket has been created to address their issue
-        - Provides a ticket number for reference
-        - Addresses the customer by name
-        - Keeps the tone professional but empathetic
-        - Keeps the response concise (3-4 sentences)"""
-
-        user_prompt = f"""Customer name: {customer_name}
-        Topic they mentioned: {extracted_topic}
-        Their complaint: {user_input}
-        Their ticket ID: {ticket_id}
+        return _messages_with_history(_NEGATIVE_SYSTEM_PROMPT, user_prompt, state)
+
+    @staticmethod
+    def handle(state: dict) -> dict:
         """
+        Process negative feedback and create a support ticket.
 
-        try:
-            completion = client.chat.completions.create(
-                model="gpt-4o",
-                messages=_messages_with_history(system_prompt, user_prompt, state),
-                temperature=0.7,
-                max_tokens=200
-            )
+        :param state: Current workflow state
+        :return: Dictionary with response and ticket info
+        """
+        log.debug("[NegativeFeedbackAgent] Processing complaint...")
+
+        ticket_id = NegativeFeedbackAgent._create_ticket(state)
+        response = _complete(
+            "NegativeFeedbackAgent",
+            NegativeFeedbackAgent._messages(state, ticket_id),
+            max_tokens=200,
+            fallback=FALLBACK_REQUEST,
+        )
 
-            response = completion.choices[0].message.content.strip()
-            print(f"✅ [NegativeFeedbackAgent] AI-generated response created!")
+        return {
+            "response": response,
+            "agent_name": "NegativeFeedbackAgent",
+            "ticket_id": ticket_id
+        }
 
-        except Exception as e:
-            response = "I'm sorry, but I'm currently unable to process your request. Please try again later."
-            print(f"❌ [NegativeFeedbackAgent] OpenAI call failed: {str(e)}")
+    @staticmethod
+    async def ahandle(state: dict) -> dict:
+        """Async version of handle(); the ticket insert runs in a worker thread."""
+        log.debug("[NegativeFeedbackAgent] Processing complaint...")
+
+        ticket_id = await asyncio.to_thread(NegativeFeedbackAgent._create_ticket, state)
+        response = await _acomplete(
+            "NegativeFeedbackAgent",
+            NegativeFeedbackAgent._messages(state, ticket_id),
+            max_tokens=200,
+            fallback=FALLBACK_REQUEST,
+        )
 
         return {
             "response": response,
@@ -166,11 +599,66 @@ class NegativeFeedbackAgent:
             "ticket_id": ticket_id
         }
 
+    @staticmethod
+    def handle_batch(states: list, poll_interval: int = 60) -> list:
+        """
+        Process many complaints through the OpenAI Batch API (bulk backfills / nightly jobs only).
+        Tickets are created up front so each prompt can reference its ticket ID; responses
+        arrive within the batch completion window, so this blocks until the batch finishes.
+
+        :param states: Workflow states, one per complaint
+        :param poll_interval: Seconds between batch status checks
+        :return: One result dict per state, in input order, shaped like handle()'s output
+        """
+        if not states:
+            return []
+        log.debug("[NegativeFeedbackAgent] Batching %d complaints...", len(states))
+
+        ticket_ids = [NegativeFeedbackAgent._create_ticket(state) for state in states]
+        requests = [
+            build_chat_request(ticket_id, {
+                "model": MODEL_BY_AGENT["NegativeFeedbackAgent"],
+                "messages": NegativeFeedbackAgent._messages(state, ticket_id),
+                "temperature": 0.7,
+                "max_tokens": 200,
+            })
+            for state, ticket_id in zip(states, ticket_ids)
+        ]
+
+        try:
+            batch_id = submit_batch(client, requests)
+            batch = wait_for_batch(client, batch_id, poll_interval=poll_interval)
+            responses = read_batch_results(client, batch)
+        except Exception as e:
+            log.warning("[NegativeFeedbackAgent] Batch call failed: %s", e)
+            responses = {}
+
+        return [
+            {
+                "response": responses.get(ticket_id, FALLBACK_REQUEST),
+                "agent_name": "NegativeFeedbackAgent",
+                "ticket_id": ticket_id
+            }
+            for ticket_id in ticket_ids
+        ]
+
 
 # ============================================================================
 # QUERY AGENT
 # ============================================================================
 
+# Ticket number like "123456", "#123456" or "ticket 123456"
+_TICKET_RE = re.compile(r'#?(\d{6})')
+# Case-insensitive name patterns; capture name (letters, spaces, hyphens, apostrophes)
+_NAME_RES = [
+    re.compile(pattern, re.IGNORECASE)
+    for pattern in (
+        r"(?:my name is|i'm|i am|this is|call me|it's)\s+([A-Za-z][A-Za-z\s\-']*(?:\s+[A-Za-z][A-Za-z\s\-']*)*)",
+        r"(?:name is|named)\s+([A-Za-z][A-Za-z\s\-']*(?:\s+[A-Za-z][A-Za-z\s\-']*)*)",
+    )
+]
+
+
 class QueryAgent:
     """
     Agent that handles ticket status queries.
@@ -181,129 +669,144 @@ class QueryAgent:
         self.get_ticket_status = TicketManager.get_ticket_status  # Bind the tool method to the agent instance
 
     @staticmethod
-    def handle(state: dict) -> dict:
+    def _candidate_names(state: dict) -> list:
         """
-        Process ticket query and look up status.
+        Customer name spellings to search for, in priority order: customer_name from state, then a
+        name extracted from the message (e.g. when the state has Guest).
+        """
+        customer_name = state["customer_name"]
+        names = []
+        if customer_name and customer_name.strip():
+            names.append(customer_name.strip())
+        extracted_name = QueryAgent._extract_customer_name_from_message(state["user_input"])
+        if extracted_name:
+            names.append(extracted_name)
+            # Common variant: "Charlie" -> "Charles" in case DB has full first name
+            if "Charlie" in extracted_name.split()[0]:
+                names.append(extracted_name.replace("Charlie", "Charles", 1))
+        return names
+
+    @staticmethod
+    def _lookup(state: dict):
+        """
+        Find the ticket(s) the query is about.
 
         :param state: Current workflow state
-        :return: Dictionary with response and ticket status
+        :return: Tuple of (ticket_number, ticket, tickets). With a ticket number in the message,
+            ticket is that ticket (or None); otherwise tickets are the customer's tickets matched by
+            customer_id or any candidate name in a single query.
+        """
+        ticket_number = QueryAgent._extract_ticket_number(state["user_input"])
+        if ticket_number:
+            return ticket_number, TicketManager.get_ticket(ticket_id=ticket_number), []
+        tickets = TicketManager.list_tickets_any(
+            customer_id=state["customer_id"],
+            customer_names=QueryAgent._candidate_names(state),
+            limit=5,
+        )
+        return ticket_number, None, tickets
+
+    @staticmethod
+    def prefetch_lookup(state: dict) -> concurrent.futures.Future:
+        """
+        Start the ticket lookup in a background thread before the query is routed here.
+        Pass the future to handle()/ahandle() as ``lookup``; an unused one can simply be dropped.
+        """
+        return _lookup_prefetcher.submit(QueryAgent._lookup, dict(state))
+
+    @staticmethod
+    def _prepare(state: dict, lookup: Optional[concurrent.futures.Future] = None):
+        """
+        Look up ticket(s) for the query and build the LLM messages.
+
+        :param state: Current workflow state
+        :param lookup: Future from prefetch_lookup, used instead of a new lookup
+        :return: See _build_messages
+        """
+        return QueryAgent._build_messages(state, *(lookup.result() if lookup else QueryAgent._lookup(state)))
+
+    @staticmethod
+    async def _aprepare(state: dict):
+        """Async version of _prepare(); the single lookup query runs in a worker thread."""
+        lookup = await asyncio.to_thread(QueryAgent._lookup, state)
+        return QueryAgent._build_messages(state, *lookup)
+
+    @staticmethod
+    def _build_messages(state: dict, ticket_number: str, ticket, tickets: list):
         """
-        print("🔍 [QueryAgent] Processing ticket query...")
+        Build the LLM messages from the lookup results.
 
+        :param state: Current workflow state
+        :param ticket_number: Ticket number extracted from the message ("" if none)
+        :param ticket: Ticket matching ticket_number, or None
+        :param tickets: Tickets found for the customer when there was no ticket number
+        :return: Tuple of (messages, ticket_id, ticket_status); messages is None when no ticket
+            was found and the templated "send your ticket number" reply should be used instead
+        """
         customer_id = state["customer_id"]
         customer_name = state["customer_name"]
         user_input = state["user_input"]
-        # extracted_topic = state["extracted_topic"]
-
-        ticket_number = QueryAgent._extract_ticket_number(user_input)
-        ticket = TicketManager.get_ticket(ticket_id=ticket_number) if ticket_number else None
         out_ticket_id = ""
         out_ticket_status = ""
 
-        system_prompt = """You are a friendly banking customer support agent responding to a ticket status query.
-        - If you are given ticket information below: give a professional, concise status update using the status, dates, and issue. If multiple tickets are listed, summarize each briefly. For status 'in_progress', add that the team is working on it and typical resolution is within 24-48 hours if not already stated.
-        - If no ticket information is given (e.g. no ticket found for customer ID or name): ask them to provide the 6-digit ticket number they received when the issue was reported.
-        - If the customer provided a ticket number but no ticket was found: politely say that no ticket was found for that number and suggest they check the number or contact support.
-        Use the customer's name. Keep the response to 2-4 sentences (or a bit more if summarizing multiple tickets)."""
-
         if ticket:
             created_str = ticket.created_at.strftime("%Y-%m-%d %H:%M") if ticket.created_at else "N/A"
             resolved_str = ticket.resolved_at.strftime("%Y-%m-%d %H:%M") if ticket.resolved_at else "N/A"
             ticket_context = (
+                "Ticket found. Use this information for your response:\n"
                 f"Ticket ID: {ticket.ticket_id}\n"
                 f"Status: {ticket.status}\n"
                 f"Created at: {created_str}\n"
                 f"Resolved at: {resolved_str}\n"
                 f"Issue: {ticket.message_content or 'N/A'}"
             )
-            
-            user_prompt = f"""Customer name: {customer_name}
-                Customer ID: {customer_id}
-                Their message: {user_input}
-                Ticket found. Use this information for your response:
-                {ticket_context}
-                """
             out_ticket_id = ticket.ticket_id
             out_ticket_status = ticket.status
 
         elif ticket_number:
             ticket_context = f"The customer asked about ticket number {ticket_number}, but no ticket was found with that ID."
-            user_prompt = f"""Customer name: {customer_name}
-                Customer ID: {customer_id}
-                Their message: {user_input}
-                {ticket_context}
-                """
             out_ticket_id = ticket_number
             out_ticket_status = "not_found"
 
-        else:            # No ticket number: search by customer_id, then customer_name from state, then name extracted from message
-            tickets = []
-            if customer_id:
-                tickets = TicketManager.list_tickets(customer_id=customer_id, limit=5)
-            if not tickets and customer_name and customer_name.strip():
-                tickets = TicketManager.list_tickets(customer_name=customer_name.strip(), limit=5)
-            # If still no tickets (e.g. state has Guest), try extracting name from the message
-            if not tickets:
-                extracted_name = QueryAgent._extract_customer_name_from_message(user_input)
-                if extracted_name:
-                    tickets = TicketManager.list_tickets(customer_name=extracted_name, limit=5)
-                # Common variant: "Charlie" -> "Charles" in case DB has full first name
-                if not tickets and extracted_name and "Charlie" in extracted_name.split()[0]:
-                    variant = extracted_name.replace("Charlie", "Charles", 1)
-                    tickets = TicketManager.list_tickets(customer_name=variant, limit=5)
-
-            if tickets:
-                parts = []
-                for t in tickets:
-                    created_str = t.created_at.strftime("%Y-%m-%d %H:%M") if t.created_at else "N/A"
-                    resolved_str = t.resolved_at.strftime("%Y-%m-%d %H:%M") if t.resolved_at else "N/A"
-                    parts.append(
-                        f"Ticket ID: {t.ticket_id}\n"
-                        f"Status: {t.status}\n"
-                        f"Created at: {created_str}\n"
-                        f"Resolved at: {resolved_str}\n"
-                        f"Issue: {t.message_content or 'N/A'}"
-                    )
-                ticket_context = (
-                    "Ticket(s) found for this customer. Use this information for your response:\n\n"
-                    + "\n---\n\n".join(parts)
+        elif tickets:
+            parts = []
+            for t in tickets:
+                created_str = t.created_at.strftime("%Y-%m-%d %H:%M") if t.created_at else "N/A"
+                resolved_str = t.resolved_at.strftime("%Y-%m-%d %H:%M") if t.resolved_at else "N/A"
+                parts.append(
+                    f"Ticket ID: {t.ticket_id}\n"
+                    f"Status: {t.status}\n"
+                    f"Created at: {created_str}\n"
+                    f"Resolved at: {resolved_str}\n"
+                    f"Issue: {t.message_content or 'N/A'}"
                 )
-                out_ticket_id = tickets[0].ticket_id
-                out_ticket_status = tickets[0].status
-                user_prompt = f"""Customer name: {customer_name}
-                    Customer ID: {customer_id}
-                    Their message: {user_input}
-                    {ticket_context}
-                    """
-            else:
-                ticket_context = (
-                    "No ticket was found for this customer ID or name. "
-                    "Please ask the customer to provide the 6-digit ticket number they received when the issue was reported."
-                )
-                user_prompt = f"""Customer name: {customer_name}
-                    Customer ID: {customer_id}
-                    Their message: {user_input}
-                    {ticket_context}
-                    """
-                out_ticket_id = ""
-                out_ticket_status = ""
-
-        try:
-            messages = _messages_with_history(system_prompt, user_prompt, state)
-            completion = client.chat.completions.create(
-                model="gpt-4o",
-                messages=messages,
-                temperature=0.7,
-                max_tokens=200
+            ticket_context = (
+                "Ticket(s) found for this customer. Use this information for your response:\n\n"
+                + "\n---\n\n".join(parts)
             )
+            out_ticket_id = tickets[0].ticket_id
+            out_ticket_status = tickets[0].status
 
-            response = completion.choices[0].message.content.strip()
-            print(f"✅ [QueryAgent] AI-generated response created!")
+        else:
+            if not USE_LLM_FOR_TRIVIAL:
+                return None, "", ""
+            ticket_context = (
+                "No ticket was found for this customer ID or name. "
+                "Please ask the customer to provide the 6-digit ticket number they received when the issue was reported."
+            )
 
-        except Exception as e:
-            response = "I'm sorry, but I'm currently unable to process your request. Please try again later."
-            print(f"❌ [QueryAgent] OpenAI call failed: {str(e)}")
+        user_prompt = (
+            f"Customer name: {customer_name}\n"
+            f"Customer ID: {customer_id}\n"
+            f"Their message: {user_input}\n"
+            f"{ticket_context}"
+        )
+        messages = _messages_with_history(_QUERY_SYSTEM_PROMPT, user_prompt, state)
+        return messages, out_ticket_id, out_ticket_status
 
+    @staticmethod
+    def _result(response: str, out_ticket_id: str, out_ticket_status: str) -> dict:
+        """Assemble the handler output, only including ticket fields that were resolved."""
         result = {
             "response": response,
             "agent_name": "QueryAgent"
@@ -314,6 +817,75 @@ class QueryAgent:
             result["ticket_status"] = out_ticket_status
         return result
 
+    @staticmethod
+    def handle(state: dict, lookup: Optional[concurrent.futures.Future] = None) -> dict:
+        """
+        Process ticket query and look up status.
+
+        :param state: Current workflow state
+        :param lookup: Ticket lookup already started with prefetch_lookup, if any
+        :return: Dictionary with response and ticket status
+        """
+        log.debug("[QueryAgent] Processing ticket query...")
+
+        messages, out_ticket_id, out_ticket_status = QueryAgent._prepare(state, lookup)
+        if messages is None:
+            response = TEMPLATE_NO_TICKET.format(customer_name=state["customer_name"])
+        else:
+            response = _complete("QueryAgent", messages, max_tokens=200, fallback=FALLBACK_REQUEST)
+        return QueryAgent._result(response, out_ticket_id, out_ticket_status)
+
+    @staticmethod
+    async def ahandle(state: dict, lookup: Optional[concurrent.futures.Future] = None) -> dict:
+        """Async version of handle(); the ticket lookup runs in a worker thread."""
+        log.debug("[QueryAgent] Processing ticket query...")
+
+        if lookup is not None:
+            # Started while the message was being classified, so it is usually finished by now
+            messages, out_ticket_id, out_ticket_status = QueryAgent._build_messages(state, *await asyncio.wrap_future(lookup))
+        else:
+            ticket_number = QueryAgent._extract_ticket_number(state["user_input"])
+            if ticket_number:
+                return await QueryAgent._ahandle_ticket_number(state, ticket_number)
+            messages, out_ticket_id, out_ticket_status = await QueryAgent._aprepare(state)
+        if messages is None:
+            response = TEMPLATE_NO_TICKET.format(customer_name=state["customer_name"])
+        else:
+            response = await _acomplete("QueryAgent", messages, max_tokens=200, fallback=FALLBACK_REQUEST)
+        return QueryAgent._result(response, out_ticket_id, out_ticket_status)
+
+    @staticmethod
+    async def _ahandle_ticket_number(state: dict, ticket_number: str) -> dict:
+        """
+        Answer a query that names a ticket number. If the lookup is still running after
+        SPECULATIVE_LOOKUP_GRACE_SECONDS, the "ticket not found" reply is generated speculatively
+        alongside it and dropped if the ticket turns up, hiding the slower of the two latencies.
+        """
+        lookup = asyncio.create_task(asyncio.to_thread(TicketManager.get_ticket, ticket_id=ticket_number))
+        speculative = None
+        done, _ = await asyncio.wait({lookup}, timeout=SPECULATIVE_LOOKUP_GRACE_SECONDS)
+        if not done:
+            not_found_messages, _, _ = QueryAgent._build_messages(state, ticket_number, None, [])
+            speculative = asyncio.create_task(
+                _acomplete("QueryAgent", not_found_messages, max_tokens=200, fallback=FALLBACK_REQUEST)
+            )
+
+        try:
+            ticket = await lookup
+        except BaseException:
+            if speculative is not None:
+                speculative.cancel()
+            raise
+
+        messages, out_ticket_id, out_ticket_status = QueryAgent._build_messages(state, ticket_number, ticket, [])
+        if ticket is None and speculative is not None:
+            response = await speculative
+        else:
+            if speculative is not None:
+                speculative.cancel()
+            response = await _acomplete("QueryAgent", messages, max_tokens=200, fallback=FALLBACK_REQUEST)
+        return QueryAgent._result(response, out_ticket_id, out_ticket_status)
+
     @staticmethod
     def _extract_ticket_number(message: str) -> str:
         """
@@ -322,16 +894,8 @@ class QueryAgent:
         :param message: User's input message
         :return: Ticket number if found, empty string otherwise
         """
-        import re
-
-        # Look for patterns like "123456" or "#123456" or "ticket 123456"
-        pattern = r'#?(\d{6})'
-        match = re.search(pattern, message)
-
-        if match:
-            return match.group(1)
-
-        return ""
+        match = _TICKET_RE.search(message)
+        return match.group(1) if match else ""
 
     @staticmethod
     def _extract_customer_name_from_message(message: str) -> Optional[str]:
@@ -339,17 +903,11 @@ class QueryAgent:
         Extract a customer name from the message (e.g. "My name is Charlie Davis", "I'm Alice").
         Returns the name string or None if not found.
         """
-        import re
         if not message or not message.strip():
             return None
         text = message.strip()
-        # Case-insensitive patterns; capture name (letters, spaces, hyphens, apostrophes)
-        patterns = [
-            r"(?:my name is|i'm|i am|this is|call me|it's)\s+([A-Za-z][A-Za-z\s\-']*(?:\s+[A-Za-z][A-Za-z\s\-']*)*)",
-            r"(?:name is|named)\s+([A-Za-z][A-Za-z\s\-']*(?:\s+[A-Za-z][A-Za-z\s\-']*)*)",
-        ]
-        for pattern in patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
+        for pattern in _NAME_RES:
+            match = pattern.search(text)
             if match:
                 name = match.group(1).strip()
                 if len(name) >= 2 and len(name) <= 80:
@@ -362,48 +920,23 @@ class ResponseAgent:
     """
 
     @staticmethod
-    def handle(state: dict) -> dict:
-        """
-        Format the response for the user.
-        """
-        print("🔍 [ResponseAgent] Formatting response...")
-
+    def _messages(state: dict) -> list:
+        """Build the LLM messages asking for a plain-text version of the handler's response."""
         response = state["response"]
         agent_name = state["agent_name"]
 
-        system_prompt = """You are a friendly banking customer agent that formats a response for the user.
-        You will receive a response from another agent. Your job is to format it as a single, clean message for the customer.
-
-        Rules:
-        - Output ONLY the message text. Do not wrap in JSON. Do not use a "response" key or any labels.
-        - Use real line breaks between paragraphs.
-        - Always end with: Best regards, Conleth Stead, Banking AI Agent
-        """
-
-        user_prompt = f"""Format this response from {agent_name} as a plain message for the customer (no JSON, no keys):
-
-        {response}"""
-
-        try:
-            messages = _messages_with_history(system_prompt, user_prompt, state)
-            completion = client.chat.completions.create(
-                model="gpt-4o",
-                messages=messages,
-                temperature=0.7,
-                max_tokens=200
-            )
-
-            response = completion.choices[0].message.content.strip()
-            print(f"✅ [ResponseAgent] AI-generated response created!")
+        user_prompt = (
+            f"Format this response from {agent_name} as a plain message for the customer (no JSON, no keys):\n\n"
+            f"{response}"
+        )
 
-        except Exception as e:
-            response = "I'm sorry, but I'm currently unable to process your request. Please try again later."
-            print(f"❌ [ResponseAgent] OpenAI call failed: {str(e)}")
+        return _messages_with_history(_RESPONSE_SYSTEM_PROMPT, user_prompt, state)
 
-        # If the model still returned JSON, extract the message text
+    @staticmethod
+    def _clean(response: str) -> str:
+        """If the model still returned JSON, extract the message text."""
         if response.strip().startswith("{"):
             try:
-                import json
                 parsed = json.loads(response)
                 if isinstance(parsed.get("response"), str):
                     response = parsed["response"]
@@ -411,52 +944,105 @@ class ResponseAgent:
                 pass
         # Ensure literal \n in the string become real newlines for display
         # response = response.replace("\\n", "\n")
-        return {"response": response}
+        return response
+
+    @staticmethod
+    def handle(state: dict) -> dict:
+        """
+        Format the response for the user.
+        """
+        log.debug("[ResponseAgent] Formatting response...")
+
+        response = _complete(
+            "ResponseAgent",
+            ResponseAgent._messages(state),
+            max_tokens=200,
+            fallback=FALLBACK_REQUEST,
+            on_delta=response_stream.get(),
+        )
+        return {"response": ResponseAgent._clean(response)}
+
+    @staticmethod
+    async def ahandle(state: dict) -> dict:
+        """Async version of handle()."""
+        log.debug("[ResponseAgent] Formatting response...")
+
+        response = await _acomplete(
+            "ResponseAgent",
+            ResponseAgent._messages(state),
+            max_tokens=200,
+            fallback=FALLBACK_REQUEST,
+            on_delta=response_stream.get(),
+        )
+        return {"response": ResponseAgent._clean(response)}
 
 class EscalationAgent:
     """
     Agent that escalates the interaction to a human agent.
     """
 
+    @staticmethod
+    def _messages(state: dict) -> list:
+        """Build the LLM messages for the escalation hand-off response."""
+        customer_name = state["customer_name"]
+        user_input = state["user_input"]
+        extracted_topic = state["extracted_topic"]
+
+        user_prompt = (
+            f"Customer name: {customer_name}\n"
+            f"Topic they mentioned: {extracted_topic}\n"
+            f"Their message: {user_input}\n\n"
+            "Generate a thank you response."
+        )
+
+        return _messages_with_history(_ESCALATION_SYSTEM_PROMPT, user_prompt, state)
+
     @staticmethod
     def handle(state: dict) -> dict:
         """
         Escalate the interaction to a human agent.
         """
-        print("🔍 [EscalationAgent] Escalating interaction to a human agent...")
+        log.debug("[EscalationAgent] Escalating interaction to a human agent...")
 
-        customer_name = state["customer_name"]
-        user_input = state["user_input"]
-        extracted_topic = state["extracted_topic"]
-
-        system_prompt = """You are a friendly banking customer support agent escalating the interaction to a human agent.
-        Generate a warm, professional, and reassuring response that:
-        - Thanks the customer by name
-        - Acknowledges their specific feedback
-        - Expresses genuine appreciation
-        - Keeps the tone professional but friendly
-        - Keeps the response concise (2-3 sentences)"""
+        response = _complete(
+            "EscalationAgent",
+            EscalationAgent._messages(state),
+            max_tokens=200,
+            fallback=FALLBACK_REQUEST,
+        )
+        return {"response": response, "agent_name": "EscalationAgent"}
 
-        user_prompt = f"""Customer name: {customer_name}
-        Topic they mentioned: {extracted_topic}
-        Their message: {user_input}
+    @staticmethod
+    async def ahandle(state: dict) -> dict:
+        """Async version of handle()."""
+        log.debug("[EscalationAgent] Escalating interaction to a human agent...")
+
+        response = await _acomplete(
+            "EscalationAgent",
+            EscalationAgent._messages(state),
+            max_tokens=200,
+            fallback=FALLBACK_REQUEST,
+        )
+        return {"response": response, "agent_name": "EscalationAgent"}
 
-        Generate a thank you response."""
 
-        try:
-            messages = _messages_with_history(system_prompt, user_prompt, state)
-            completion = client.chat.completions.create(
-                model="gpt-4o",
-                messages=messages,
-                temperature=0.7,
-                max_tokens=200
-            )
+# Handler agent per classified_type; "escalation" is used for low-confidence classifications
+HANDLERS = {
+    "positive_feedback": PositiveFeedbackAgent,
+    "negative_feedback": NegativeFeedbackAgent,
+    "query": QueryAgent,
+    "escalation": EscalationAgent,
+}
 
-            response = completion.choices[0].message.content.strip()
-            print(f"✅ [EscalationAgent] AI-generated response created!")
 
-        except Exception as e:
-            response = "I'm sorry, but I'm currently unable to process your request. Please try again later."
-            print(f"❌ [EscalationAgent] OpenAI call failed: {str(e)}")
+def get_handler(classification: str):
+    """
+    Return the agent class that handles a classification.
 
-        return {"response": response, "agent_name": "EscalationAgent"}
\ No newline at end of file
+    :param classification: classified_type ("query", "positive_feedback", "negative_feedback") or "escalation"
+    :return: Agent class exposing handle(state) / ahandle(state)
+    """
+    try:
+        return HANDLERS[classification]
+    except KeyError:
+        raise ValueError(f"Invalid classification type: {classification}") from None
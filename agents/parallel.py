@@ -0,0 +1,104 @@
+"""
+Concurrent, rate-limited dispatch of async agent calls.
+Modeled on the OpenAI cookbook's api_request_parallel_processor: a semaphore bounds the
+number of in-flight calls, token buckets keep requests/min and tokens/min under the
+account limits, and 429 responses are retried with exponential backoff.
+"""
+
+import asyncio
+import logging
+import random
+import time
+from typing import Awaitable, Callable, Optional
+
+from openai import RateLimitError
+
+# Default account limits (requests/min, tokens/min) and concurrency
+DEFAULT_RPM = 3500
+DEFAULT_TPM = 90000
+DEFAULT_CONCURRENCY = 20
+MAX_RETRIES = 5
+BASE_BACKOFF_SECONDS = 1.0
+
+log = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at capacity_per_minute / 60 per second.
+    Callers await acquire(n) until n units are available.
+    """
+
+    def __init__(self, capacity_per_minute: float):
+        self.capacity = float(capacity_per_minute)
+        self.rate = self.capacity / 60.0
+        self.available = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, amount: float = 1.0) -> None:
+        """Wait until ``amount`` units can be taken from the bucket."""
+        amount = min(float(amount), self.capacity)
+        while True:
+            async with self._lock:
+                now = time.monotonic()
+                self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.available >= amount:
+                    self.available -= amount
+                    return
+                wait = (amount - self.available) / self.rate
+            await asyncio.sleep(wait)
+
+
+def estimate_tokens(item) -> int:
+    """Rough token estimate for an item (~4 characters per token), used for the TPM budget."""
+    if isinstance(item, dict):
+        text = " ".join(str(item.get(key, "")) for key in ("user_input", "response", "conversation_history"))
+    else:
+        text = str(item)
+    return max(1, len(text) // 4)
+
+
+async def parallel_map(
+    coro_fn: Callable[..., Awaitable],
+    items: list,
+    rpm: int = DEFAULT_RPM,
+    tpm: int = DEFAULT_TPM,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    token_cost: Optional[Callable] = None,
+    max_retries: int = MAX_RETRIES,
+) -> list:
+    """
+    Run ``coro_fn(item)`` for every item concurrently within the given rate limits.
+    Example: ``results = await parallel_map(QueryAgent.ahandle, states)``
+
+    :param coro_fn: Async function taking one item (e.g. an agent's ahandle)
+    :param items: Inputs to dispatch
+    :param rpm: Requests-per-minute budget
+    :param tpm: Tokens-per-minute budget
+    :param concurrency: Maximum number of in-flight calls
+    :param token_cost: Function estimating the tokens one item consumes (default: estimate_tokens)
+    :param max_retries: Retries per item on 429 rate-limit errors
+    :return: Results in the same order as ``items``
+    """
+    token_cost = token_cost or estimate_tokens
+    request_bucket = TokenBucket(rpm)
+    token_bucket = TokenBucket(tpm)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_one(item):
+        async with semaphore:
+            for attempt in range(max_retries + 1):
+                await request_bucket.acquire(1)
+                await token_bucket.acquire(token_cost(item))
+                try:
+                    return await coro_fn(item)
+                except RateLimitError:
+                    if attempt == max_retries:
+                        raise
+                    backoff = BASE_BACKOFF_SECONDS * (2 ** attempt) + random.uniform(0, 1)
+                    log.info("[parallel_map] Rate limited, retrying in %.1fs (attempt %d/%d)", backoff, attempt + 1, max_retries)
+                    await asyncio.sleep(backoff)
+
+    return await asyncio.gather(*(run_one(item) for item in items))
@@ -0,0 +1,102 @@
+"""
+Celery tasks that run agent handlers out-of-band, so a front-end doesn't hold a connection
+open for the whole LLM call. Progress and results are kept in a Redis hash per task.
+
+Start a worker from the project root:
+    celery -A agents.tasks worker --loglevel=info
+"""
+
+import os
+import uuid
+
+import redis
+from celery import Celery
+from dotenv import load_dotenv
+
+from .handlers import get_handler
+
+load_dotenv()
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# How long task status hashes stay in Redis
+TASK_STATUS_TTL_SECONDS = 24 * 3600
+MAX_RETRIES = 3
+
+app = Celery("agents", broker=REDIS_URL)
+redis_client = redis.Redis.from_url(REDIS_URL, decode_responses=True)
+
+
+def _status_key(task_id: str) -> str:
+    return f"task:{task_id}"
+
+
+def _set_status(task_id: str, **fields) -> None:
+    """Write fields to the task's status hash (None values are stored as empty strings)."""
+    key = _status_key(task_id)
+    redis_client.hset(key, mapping={name: "" if value is None else str(value) for name, value in fields.items()})
+    redis_client.expire(key, TASK_STATUS_TTL_SECONDS)
+
+
+@app.task(bind=True, max_retries=MAX_RETRIES)
+def run_handler(self, classification: str, state: dict) -> dict:
+    """
+    Run the agent for ``classification`` on ``state`` and record the result in Redis.
+
+    :param classification: classified_type or "escalation" (see get_handler)
+    :param state: Workflow state (must be JSON-serializable)
+    :return: The handler's result dict
+    """
+    task_id = self.request.id
+    _set_status(task_id, status="running")
+    try:
+        result = get_handler(classification).handle(state)
+    except ValueError as e:
+        _set_status(task_id, status="failed", error=str(e))
+        raise
+    except Exception as e:
+        if self.request.retries >= MAX_RETRIES:
+            _set_status(task_id, status="failed", error=str(e))
+            raise
+        _set_status(task_id, status="retrying", error=str(e))
+        raise self.retry(exc=e, countdown=2 ** self.request.retries)
+
+    _set_status(
+        task_id,
+        status="completed",
+        response=result.get("response"),
+        agent_name=result.get("agent_name"),
+        ticket_id=result.get("ticket_id"),
+        ticket_status=result.get("ticket_status"),
+    )
+    return result
+
+
+def submit_handler(classification: str, state: dict) -> str:
+    """
+    Queue a handler run and return its task ID; poll get_task_status() for the result.
+
+    :param classification: classified_type or "escalation"
+    :param state: Workflow state
+    :return: Celery task ID
+    """
+    # "queued" is written before dispatch: a fast worker may already be reporting progress by the
+    # time apply_async returns, and a later "queued" would overwrite it for good
+    task_id = str(uuid.uuid4())
+    _set_status(task_id, status="queued")
+    try:
+        run_handler.apply_async(args=(classification, state), task_id=task_id)
+    except Exception as e:
+        _set_status(task_id, status="failed", error=str(e))
+        raise
+    return task_id
+
+
+def get_task_status(task_id: str) -> dict:
+    """
+    Read a task's status hash.
+
+    :param task_id: ID returned by submit_handler
+    :return: Dict with "status" (queued / running / retrying / completed / failed) and, once
+        completed, "response", "agent_name", "ticket_id", "ticket_status"; empty if unknown or expired
+    """
+    return redis_client.hgetall(_status_key(task_id))
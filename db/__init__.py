@@ -10,7 +10,7 @@ from .database import (
     init_db,
     seed_test_data
 )
-from .db_utils import TicketManager, LogManager, SessionManager
+from .db_utils import TicketManager, LogManager, SessionManager, flush_logs, forget_session, dropped_log_rows
 
 __all__ = [
     "get_session",
@@ -21,5 +21,8 @@ __all__ = [
     "seed_test_data",
     "TicketManager",
     "LogManager",
-    "SessionManager"
+    "SessionManager",
+    "flush_logs",
+    "forget_session",
+    "dropped_log_rows",
 ]
@@ -4,11 +4,14 @@ Supports SQLite (local) and PostgreSQL (Cloud SQL for production)
 """
 
 import os
-from datetime import datetime
-from sqlalchemy import create_engine, Column, String, Text, Float, DateTime, Integer, ForeignKey, Index
+from functools import lru_cache
+from sqlalchemy import create_engine, event, inspect, text, Column, String, Text, Float, DateTime, Integer, ForeignKey, Index, JSON
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
-import json
+from sqlalchemy.pool import QueuePool, StaticPool
+from sqlalchemy.sql.expression import FunctionElement
 
 
 def get_database_url():
@@ -32,25 +35,102 @@ def get_database_url():
 DATABASE_URL = get_database_url()
 DB_PATH = DATABASE_URL.replace("sqlite:///", "") if DATABASE_URL.startswith("sqlite") else None
 
-# Create engine with appropriate settings
-if DATABASE_URL.startswith("postgresql"):
-    engine = create_engine(
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    SQLite file databases: WAL lets readers and the writer proceed concurrently, synchronous=NORMAL
+    drops the second fsync per commit, and busy_timeout waits on locks instead of failing with
+    "database is locked"
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA cache_size=-64000")
+    cursor.execute("PRAGMA mmap_size=268435456")
+    cursor.close()
+
+
+@lru_cache(maxsize=1)
+def get_engine():
+    """Create the process-wide engine once (appropriate settings for PostgreSQL or SQLite)"""
+    if DATABASE_URL.startswith("postgresql"):
+        return create_engine(
+            DATABASE_URL,
+            echo=False,
+            pool_size=5,
+            max_overflow=10,
+            pool_pre_ping=True,
+        )
+
+    if ":memory:" in DATABASE_URL:
+        # One shared connection, otherwise every pooled connection would see its own empty database
+        return create_engine(
+            DATABASE_URL,
+            echo=False,
+            poolclass=StaticPool,
+            connect_args={"check_same_thread": False},
+        )
+
+    # Reuse connections across threads so the PRAGMAs and page cache survive between requests
+    sqlite_engine = create_engine(
         DATABASE_URL,
         echo=False,
+        poolclass=QueuePool,
         pool_size=5,
         max_overflow=10,
         pool_pre_ping=True,
+        connect_args={"check_same_thread": False, "timeout": 5.0},
     )
-else:
-    engine = create_engine(DATABASE_URL, echo=False)
+    event.listen(sqlite_engine, "connect", _set_sqlite_pragmas)
+    return sqlite_engine
+
+
+engine = get_engine()
+
+# Set by init_db once the schema has been checked in this process
+_schema_ready = False
+
+
+class utcnow(FunctionElement):
+    """
+    Current UTC time as a naive timestamp, evaluated by the database inside the INSERT/UPDATE
+    (no Python callback per row). Matches the datetime.utcnow values already stored.
+    """
+    type = DateTime()
+    inherit_cache = True
+
+
+@compiles(utcnow)
+def _utcnow_default(element, compiler, **kw):
+    return "CURRENT_TIMESTAMP"
+
+
+@compiles(utcnow, "postgresql")
+def _utcnow_postgresql(element, compiler, **kw):
+    return "TIMEZONE('utc', CURRENT_TIMESTAMP)"
+
+
+@compiles(utcnow, "sqlite")
+def _utcnow_sqlite(element, compiler, **kw):
+    # CURRENT_TIMESTAMP has 1s resolution on SQLite; keep sub-second ordering
+    return "STRFTIME('%Y-%m-%d %H:%M:%f', 'now')"
+
+
+# Native JSON column type: JSONB on PostgreSQL, JSON (JSON1 text) on SQLite.
+# Values are (de)serialized by SQLAlchemy, so callers read and write plain lists/dicts.
+JSONType = JSON().with_variant(JSONB(), "postgresql")
 
 Base = declarative_base()
-SessionLocal = sessionmaker(bind=engine)
+# expire_on_commit=False: objects returned from closed sessions stay usable without a reload SELECT
+SessionLocal = sessionmaker(bind=get_engine(), expire_on_commit=False)
 
 
 class SupportTicket(Base):
     """Support ticket model"""
     __tablename__ = "support_tickets"
+    # Fetch DB-generated timestamps back on flush so they're usable after the session closes
+    __mapper_args__ = {"eager_defaults": True}
 
     ticket_id = Column(String(10), primary_key=True)
     customer_id = Column(String(100), nullable=False, index=True)
@@ -58,14 +138,21 @@ class SupportTicket(Base):
     message_content = Column(Text, nullable=False)
     classification = Column(String(50))  # positive_feedback, negative_feedback, query
     status = Column(String(50), default="unresolved", index=True)  # unresolved, in_progress, resolved
-    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    created_at = Column(DateTime, default=utcnow(), index=True)
     resolved_at = Column(DateTime, nullable=True)
-    last_updated = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    last_updated = Column(DateTime, default=utcnow(), onupdate=utcnow())
     agent_response = Column(Text)
     customer_feedback = Column(String(50), nullable=True)
 
-    # Relationship to interaction logs
-    interaction_logs = relationship("InteractionLog", back_populates="ticket")
+    # list_tickets(customer_id=...) filters by customer and orders by newest first
+    __table_args__ = (
+        Index("ix_ticket_customer_created", "customer_id", "created_at"),
+    )
+
+    # Read-only view of the ticket's interaction logs (logs are written through the ticket_id FK, so
+    # nothing is tracked at flush). Never lazy-loaded: request it with selectinload
+    # (e.g. TicketManager.list_tickets(with_logs=True)) so lists don't fan out into N+1 SELECTs
+    interaction_logs = relationship("InteractionLog", viewonly=True, lazy="raise")
 
     def __repr__(self):
         return f"<SupportTicket(ticket_id={self.ticket_id}, customer_id={self.customer_id}, status={self.status})>"
@@ -74,6 +161,8 @@ class SupportTicket(Base):
 class InteractionLog(Base):
     """Interaction log model"""
     __tablename__ = "interaction_logs"
+    # Fetch DB-generated timestamps back on flush so they're usable after the session closes
+    __mapper_args__ = {"eager_defaults": True}
 
     log_id = Column(Integer, primary_key=True, autoincrement=True)
     customer_id = Column(String(100), nullable=False, index=True)
@@ -85,11 +174,13 @@ class InteractionLog(Base):
     agent_path = Column(String(255))  # Which handler was used
     response = Column(Text)
     processing_time_ms = Column(Integer)  # Milliseconds
-    timestamp = Column(DateTime, default=datetime.utcnow, index=True)
+    timestamp = Column(DateTime, default=utcnow(), index=True)
     errors = Column(Text, nullable=True)  # JSON string of errors
 
-    # Relationship to support ticket
-    ticket = relationship("SupportTicket", back_populates="interaction_logs")
+    # get_logs_by_customer filters by customer and orders by newest first
+    __table_args__ = (
+        Index("ix_interaction_customer_time", "customer_id", "timestamp"),
+    )
 
     def __repr__(self):
         return f"<InteractionLog(log_id={self.log_id}, customer_id={self.customer_id}, classification={self.classification})>"
@@ -98,21 +189,66 @@ class InteractionLog(Base):
 class SessionHistory(Base):
     """Session history model"""
     __tablename__ = "session_history"
+    # Fetch DB-generated timestamps back on flush so they're usable after the session closes
+    __mapper_args__ = {"eager_defaults": True}
 
     session_id = Column(String(100), primary_key=True)
     customer_id = Column(String(100), index=True)
-    interaction_logs_json = Column(Text)  # JSON string of log IDs
-    created_at = Column(DateTime, default=datetime.utcnow)
-    last_accessed = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-    session_context = Column(Text)  # JSON string of context
+    interaction_logs_json = Column(JSONType)  # List of log IDs
+    created_at = Column(DateTime, default=utcnow())
+    last_accessed = Column(DateTime, default=utcnow(), onupdate=utcnow())
+    session_context = Column(JSONType)  # Context dict
 
     def __repr__(self):
         return f"<SessionHistory(session_id={self.session_id}, customer_id={self.customer_id})>"
 
 
+def _migrate_json_columns(inspector, table):
+    """
+    Convert JSON columns that an older schema created as TEXT/JSON on PostgreSQL to JSONB in place,
+    so the jsonb ``||`` append in db_utils works on deployed databases. Empty strings become NULL.
+
+    :param inspector: Inspector bound to the engine
+    :param table: Table from Base.metadata that already exists in the database
+    """
+    existing_types = {column["name"]: column["type"] for column in inspector.get_columns(table.name)}
+    quote = engine.dialect.identifier_preparer.quote
+    for column in table.columns:
+        if (not isinstance(column.type, JSON) or column.name not in existing_types
+                or isinstance(existing_types[column.name], JSONB)):
+            continue
+        with engine.begin() as connection:
+            connection.execute(text(
+                f"ALTER TABLE {quote(table.name)} ALTER COLUMN {quote(column.name)} "
+                f"TYPE jsonb USING NULLIF({quote(column.name)}::text, '')::jsonb"
+            ))
+        print(f"✓ Migrated {table.name}.{column.name} to jsonb")
+
+
 def init_db():
-    """Initialize the database - create all tables"""
-    Base.metadata.create_all(engine)
+    """
+    Initialize the database - create missing tables and indexes, and migrate legacy
+    TEXT/JSON columns to JSONB on PostgreSQL.
+    The schema is inspected once per process; later calls return without touching the database.
+    """
+    global _schema_ready
+    if not _schema_ready:
+        inspector = inspect(engine)
+        existing_tables = set(inspector.get_table_names())
+        missing_tables = [table for table in Base.metadata.sorted_tables if table.name not in existing_tables]
+        if missing_tables:
+            Base.metadata.create_all(engine, tables=missing_tables)
+        # Existing tables may predate indexes added since the DB was created
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    index.create(engine)
+            if engine.dialect.name == "postgresql":
+                _migrate_json_columns(inspector, table)
+        _schema_ready = True
     if DB_PATH:
         print(f"✓ Database initialized at {DB_PATH}")
     else:
@@ -127,11 +263,9 @@ def get_session():
 
 def seed_test_data():
     """Add sample test data to the database"""
-    session = get_session()
-
-    # Sample support tickets
+    # Sample support tickets (plain dicts: bulk insert skips ORM instance construction)
     test_tickets = [
-        SupportTicket(
+        dict(
             ticket_id="123456",
             customer_id="CUST001",
             customer_name="John Smith",
@@ -140,7 +274,7 @@ def seed_test_data():
             status="unresolved",
             agent_response="We apologize for the inconvenience. A new ticket #123456 has been created to track your card replacement."
         ),
-        SupportTicket(
+        dict(
             ticket_id="234567",
             customer_id="CUST002",
             customer_name="Sarah Johnson",
@@ -152,15 +286,12 @@ def seed_test_data():
         ),
     ]
 
-    for ticket in test_tickets:
-        try:
-            session.add(ticket)
-        except Exception as e:
-            print(f"Warning: Could not add ticket {ticket.ticket_id}: {e}")
-
-    session.commit()
-    print(f"✓ Added {len(test_tickets)} sample tickets")
-    session.close()
+    try:
+        with SessionLocal.begin() as session:
+            session.bulk_insert_mappings(SupportTicket, test_tickets)
+        print(f"✓ Added {len(test_tickets)} sample tickets")
+    except Exception as e:
+        print(f"Warning: Could not add sample tickets: {e}")
 
 
 if __name__ == "__main__":
@@ -4,102 +4,239 @@ Common queries and operations
 """
 
 from datetime import datetime, timedelta
+import atexit
 import json
-import random
-from sqlalchemy import func
-from .database import get_session, SupportTicket, InteractionLog, SessionHistory
+import logging
+import queue
+import secrets
+import threading
+import time
+from cachetools import TTLCache
+from sqlalchemy import case, func, insert, literal, or_, select, update
+from sqlalchemy.orm import raiseload, selectinload
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from .database import SessionLocal, utcnow, SupportTicket, InteractionLog, SessionHistory
 from langchain.tools import tool
 
+_dumps = json.dumps
+
+log = logging.getLogger(__name__)
+
+# Write-behind interaction logging: queued rows are inserted in batches of up to
+# LOG_FLUSH_MAX_ROWS, at most LOG_FLUSH_INTERVAL_SECONDS after the first one was queued.
+# Producers block once LOG_QUEUE_MAX_ROWS rows are waiting, so a slow database applies
+# backpressure instead of growing the queue without bound.
+LOG_FLUSH_MAX_ROWS = 1000
+LOG_FLUSH_INTERVAL_SECONDS = 0.5
+LOG_QUEUE_MAX_ROWS = 10000
+_log_queue = queue.Queue(maxsize=LOG_QUEUE_MAX_ROWS)
+_log_flusher_thread = None
+_log_flusher_lock = threading.Lock()
+# Queued rows that could not be written even one at a time (see dropped_log_rows)
+_dropped_log_rows = 0
+_dropped_log_rows_lock = threading.Lock()
+
+# Short-lived cache of ticket statuses for the status tool; invalidated when a ticket is updated
+STATUS_CACHE_TTL_SECONDS = 30
+_status_cache = TTLCache(maxsize=10000, ttl=STATUS_CACHE_TTL_SECONDS)
+_status_cache_lock = threading.Lock()
+
+# Sessions known to exist, keyed by (session_id, customer_id): appends to them skip the
+# get-or-create SELECT and run as a single UPDATE that extends the JSON array in SQL
+SESSION_CACHE_TTL_SECONDS = 60
+_known_sessions = TTLCache(maxsize=10000, ttl=SESSION_CACHE_TTL_SECONDS)
+_known_sessions_lock = threading.Lock()
+
+# Random ticket IDs to try before giving up (a collision needs the same 1-in-900k draw)
+TICKET_ID_ATTEMPTS = 3
+
+
+def _insert_ignoring_conflicts(session, model):
+    """INSERT ... ON CONFLICT (primary key) DO NOTHING for the session's dialect (SQLite or PostgreSQL)"""
+    if session.get_bind().dialect.name == "postgresql":
+        stmt = postgresql_insert(model)
+    else:
+        stmt = sqlite_insert(model)
+    return stmt.on_conflict_do_nothing(index_elements=[column.name for column in model.__table__.primary_key])
+
+
+def _json_array_length(session, column):
+    """Length of a JSON array column computed in SQL for the session's dialect (SQLite or PostgreSQL)"""
+    if session.get_bind().dialect.name == "postgresql":
+        return func.jsonb_array_length(column)
+    return func.json_array_length(column)
+
+
+def _json_array_append(session, column, values):
+    """A JSON array column (NULL as empty) with values appended, computed in SQL for the session's dialect"""
+    if session.get_bind().dialect.name == "postgresql":
+        return func.coalesce(column, func.jsonb_build_array()).op("||")(func.jsonb_build_array(*values))
+    paths = []
+    for value in values:
+        paths += [literal("$[#]"), value]
+    return func.json_insert(func.coalesce(column, func.json_array()), *paths)
+
 
 class TicketManager:
     """Manage support tickets"""
 
     @staticmethod
     def generate_ticket_id():
-        """Generate a unique 6-digit ticket ID"""
-        session = get_session()
-        while True:
-            ticket_id = str(random.randint(100000, 999999))
-            existing = session.query(SupportTicket).filter_by(ticket_id=ticket_id).first()
-            if not existing:
-                session.close()
-                return ticket_id
-        session.close()
+        """Draw a random 6-digit ticket ID (uniqueness is enforced on insert by create_ticket)"""
+        return str(secrets.randbelow(900000) + 100000)
 
     @staticmethod
     def create_ticket(customer_id, customer_name, message_content, classification):
-        """Create a new support ticket"""
-        session = get_session()
-        ticket_id = TicketManager.generate_ticket_id()
-        
-        ticket = SupportTicket(
-            ticket_id=ticket_id,
-            customer_id=customer_id,
-            customer_name=customer_name,
-            message_content=message_content,
-            classification=classification,
-            status="unresolved"
-        )
-        
-        session.add(ticket)
-        session.commit()
-        session.close()
-        return ticket_id
+        """
+        Create a new support ticket.
+        Inserts with ON CONFLICT DO NOTHING and retries with a fresh ID on the rare collision,
+        so each attempt is a single round trip instead of a SELECT-then-INSERT.
+        """
+        with SessionLocal.begin() as session:
+            for _ in range(TICKET_ID_ATTEMPTS):
+                ticket_id = TicketManager.generate_ticket_id()
+                stmt = _insert_ignoring_conflicts(session, SupportTicket).values(
+                    ticket_id=ticket_id,
+                    customer_id=customer_id,
+                    customer_name=customer_name,
+                    message_content=message_content,
+                    classification=classification,
+                    status="unresolved",
+                ).returning(SupportTicket.ticket_id)
+                # No row comes back when the ID was already taken
+                if session.execute(stmt).scalar_one_or_none():
+                    return ticket_id
+        raise RuntimeError(f"Could not allocate a unique ticket ID after {TICKET_ID_ATTEMPTS} attempts")
+
+    @staticmethod
+    def bulk_create_tickets(rows):
+        """
+        Create many tickets with a single executemany INSERT (e.g. import jobs).
+        Each row is a dict of SupportTicket columns and must include ticket_id; omitted
+        columns such as status and created_at get their column defaults.
+        Returns the number of tickets inserted.
+        """
+        if not rows:
+            return 0
+        with SessionLocal.begin() as session:
+            session.execute(insert(SupportTicket), rows)
+        return len(rows)
 
     @staticmethod
     def get_ticket(ticket_id):
         """Retrieve a ticket by ID"""
-        session = get_session()
-        ticket = session.query(SupportTicket).filter_by(ticket_id=ticket_id).first()
-        session.close()
-        return ticket
+        with SessionLocal() as session:
+            return session.get(SupportTicket, ticket_id)
+
+    @staticmethod
+    def get_status(ticket_id):
+        """
+        Return a ticket's status (None if not found), served from a 30s TTL cache when possible.
+        Only the status column is fetched on a miss.
+        """
+        with _status_cache_lock:
+            status = _status_cache.get(ticket_id)
+        if status is not None:
+            return status
+        with SessionLocal() as session:
+            status = session.scalar(select(SupportTicket.status).where(SupportTicket.ticket_id == ticket_id))
+        if status is not None:
+            with _status_cache_lock:
+                _status_cache[ticket_id] = status
+        return status
 
     @staticmethod
     def update_ticket_status(ticket_id, new_status):
-        """Update ticket status"""
-        session = get_session()
-        ticket = session.query(SupportTicket).filter_by(ticket_id=ticket_id).first()
-        if ticket:
-            ticket.status = new_status
-            if new_status == "resolved":
-                ticket.resolved_at = datetime.utcnow()
-            ticket.last_updated = datetime.utcnow()
-            session.commit()
-        session.close()
+        """Update ticket status in a single UPDATE ... RETURNING; returns the updated ticket or None"""
+        values = {"status": new_status}
+        if new_status == "resolved":
+            values["resolved_at"] = utcnow()
+        with SessionLocal.begin() as session:
+            ticket = session.execute(
+                update(SupportTicket)
+                .where(SupportTicket.ticket_id == ticket_id)
+                .values(**values)
+                .returning(SupportTicket)
+            ).scalar_one_or_none()
+        # Invalidate after commit so a concurrent read can't re-cache the old status
+        with _status_cache_lock:
+            _status_cache.pop(ticket_id, None)
         return ticket
 
     @staticmethod
     def add_agent_response(ticket_id, response):
-        """Add agent response to ticket"""
-        session = get_session()
-        ticket = session.query(SupportTicket).filter_by(ticket_id=ticket_id).first()
-        if ticket:
-            ticket.agent_response = response
-            ticket.last_updated = datetime.utcnow()
-            session.commit()
-        session.close()
+        """Add agent response to ticket with a single UPDATE; returns the number of tickets updated (0 if missing)"""
+        with SessionLocal.begin() as session:
+            rowcount = session.execute(
+                update(SupportTicket)
+                .where(SupportTicket.ticket_id == ticket_id)
+                .values(agent_response=response)
+            ).rowcount
+        with _status_cache_lock:
+            _status_cache.pop(ticket_id, None)
+        return rowcount
 
     @staticmethod
-    def list_tickets(status=None, customer_id=None, customer_name=None, limit=10):
-        """List tickets with optional filters. customer_name is partial, case-insensitive match."""
-        session = get_session()
-        query = session.query(SupportTicket)
-        
-        if status:
-            query = query.filter_by(status=status)
-        if customer_id:
-            query = query.filter_by(customer_id=customer_id)
-        if customer_name and customer_name.strip():
-            name = customer_name.strip().lower()
-            query = query.filter(
-                SupportTicket.customer_name.isnot(None),
-                func.lower(SupportTicket.customer_name).like(f"%{name}%"),
-            )
-        
-        tickets = query.order_by(SupportTicket.created_at.desc()).limit(limit).all()
-        session.close()
-        return tickets
+    def list_tickets(status=None, customer_id=None, customer_name=None, limit=10, with_logs=False):
+        """
+        List tickets with optional filters. customer_name is partial, case-insensitive match.
+        with_logs=True also loads each ticket's interaction_logs (one extra SELECT for all tickets).
+        """
+        with SessionLocal() as session:
+            stmt = select(SupportTicket)
+            if with_logs:
+                stmt = stmt.options(selectinload(SupportTicket.interaction_logs), raiseload("*"))
+            else:
+                stmt = stmt.options(raiseload("*"))
+
+            if status:
+                stmt = stmt.where(SupportTicket.status == status)
+            if customer_id:
+                stmt = stmt.where(SupportTicket.customer_id == customer_id)
+            if customer_name and customer_name.strip():
+                name = customer_name.strip().lower()
+                stmt = stmt.where(
+                    SupportTicket.customer_name.isnot(None),
+                    func.lower(SupportTicket.customer_name).like(f"%{name}%"),
+                )
+
+            return session.scalars(stmt.order_by(SupportTicket.created_at.desc()).limit(limit)).all()
     
+    @staticmethod
+    def list_tickets_any(customer_id=None, customer_names=None, limit=5):
+        """
+        Find a customer's tickets by ID or any of several name spellings in one query.
+        Candidates are ranked (customer_id first, then customer_names in the order given) and only
+        tickets matching the best-ranked candidate are returned, i.e. the same tickets as trying
+        list_tickets(customer_id=...) and then list_tickets(customer_name=...) for each name in turn.
+        """
+        names = [name.strip().lower() for name in (customer_names or []) if name and name.strip()]
+        if not customer_id and not names:
+            return []
+
+        lowered_name = func.lower(SupportTicket.customer_name)
+        conditions = []
+        if customer_id:
+            conditions.append(SupportTicket.customer_id == customer_id)
+        conditions.extend(
+            SupportTicket.customer_name.isnot(None) & lowered_name.like(f"%{name}%") for name in names
+        )
+        rank = case(*((condition, i) for i, condition in enumerate(conditions)), else_=len(conditions))
+
+        with SessionLocal() as session:
+            rows = session.execute(
+                select(SupportTicket, rank)
+                .options(raiseload("*"))
+                .where(or_(*conditions))
+                .order_by(rank, SupportTicket.created_at.desc())
+                .limit(limit)
+            ).all()
+        if not rows:
+            return []
+        best_rank = rows[0][1]
+        return [ticket for ticket, ticket_rank in rows if ticket_rank == best_rank]
+
     @tool("Get ticket status")
     def get_ticket_status(ticket_id: str) -> str:
         """
@@ -113,11 +250,11 @@ class TicketManager:
         """
         print(f"🔍 [Tool] Fetching status for ticket ID: {ticket_id}")
         
-        ticket = TicketManager.get_ticket(ticket_id)
-        
-        if ticket:
-            print(f"✅ [Tool] Ticket found. Status: {ticket.status}")
-            return f"Ticket #{ticket_id} is currently '{ticket.status}'."
+        status = TicketManager.get_status(ticket_id)
+
+        if status is not None:
+            print(f"✅ [Tool] Ticket found. Status: {status}")
+            return f"Ticket #{ticket_id} is currently '{status}'."
         else:
             print(f"❌ [Tool] Ticket with ID {ticket_id} not found.")
             return f"Sorry, I couldn't find a ticket with ID {ticket_id}."
@@ -127,12 +264,10 @@ class LogManager:
     """Manage interaction logs"""
 
     @staticmethod
-    def log_interaction(customer_id, input_message, classification, confidence,
-                       extracted_topic, ticket_id, agent_path, response, processing_time_ms, errors=None):
-        """Log a customer interaction"""
-        session = get_session()
-        
-        log = InteractionLog(
+    def _interaction_row(customer_id, input_message, classification, confidence,
+                         extracted_topic, ticket_id, agent_path, response, processing_time_ms, errors=None):
+        """Column values for one InteractionLog row"""
+        return dict(
             customer_id=customer_id,
             input_message=input_message,
             classification=classification,
@@ -142,150 +277,337 @@ class LogManager:
             agent_path=agent_path,
             response=response,
             processing_time_ms=processing_time_ms,
-            errors=str(errors) if errors else None
+            # Parseable JSON (the column's documented format); nothing to serialize on the success path
+            errors=_dumps(errors, default=str) if errors else None,
         )
-        
-        session.add(log)
-        session.commit()
-        log_id = log.log_id
-        session.close()
-        return log_id
+
+    @staticmethod
+    def log_interaction(customer_id, input_message, classification, confidence,
+                       extracted_topic, ticket_id, agent_path, response, processing_time_ms, errors=None,
+                       session_id=None):
+        """
+        Log a customer interaction and return its log_id (use enqueue_interaction when the ID isn't needed).
+        A single INSERT ... RETURNING, bypassing the ORM unit of work; with a session_id the log is
+        appended to that session in the same transaction.
+        """
+        row = LogManager._interaction_row(
+            customer_id, input_message, classification, confidence,
+            extracted_topic, ticket_id, agent_path, response, processing_time_ms, errors,
+        )
+        with SessionLocal.begin() as session:
+            log_id = session.execute(
+                insert(InteractionLog).values(**row).returning(InteractionLog.log_id)
+            ).scalar_one()
+            if session_id is not None:
+                _append_session_logs(session, session_id, customer_id, [log_id])
+            return log_id
+
+    @staticmethod
+    def enqueue_interaction(customer_id, input_message, classification, confidence,
+                            extracted_topic, ticket_id, agent_path, response, processing_time_ms, errors=None,
+                            session_id=None):
+        """
+        Queue a customer interaction for a batched background insert and return immediately.
+        With a session_id the new log is also appended to that session once it is written.
+        No log_id is available; call flush_logs() to wait until queued logs are written.
+        """
+        row = LogManager._interaction_row(
+            customer_id, input_message, classification, confidence,
+            extracted_topic, ticket_id, agent_path, response, processing_time_ms, errors,
+        )
+        row["timestamp"] = datetime.utcnow()
+        _ensure_log_flusher()
+        _log_queue.put((row, session_id))
 
     @staticmethod
     def get_logs_by_customer(customer_id, limit=20):
         """Get interaction logs for a customer"""
-        session = get_session()
-        logs = session.query(InteractionLog).filter_by(
-            customer_id=customer_id
-        ).order_by(InteractionLog.timestamp.desc()).limit(limit).all()
-        session.close()
-        return logs
+        with SessionLocal() as session:
+            return session.scalars(
+                select(InteractionLog)
+                .options(raiseload("*"))
+                .where(InteractionLog.customer_id == customer_id)
+                .order_by(InteractionLog.timestamp.desc())
+                .limit(limit)
+            ).all()
 
     @staticmethod
     def get_logs_by_date_range(start_date, end_date):
         """Get logs within a date range"""
-        session = get_session()
-        logs = session.query(InteractionLog).filter(
-            InteractionLog.timestamp >= start_date,
-            InteractionLog.timestamp <= end_date
-        ).order_by(InteractionLog.timestamp.desc()).all()
-        session.close()
-        return logs
+        with SessionLocal() as session:
+            return session.scalars(
+                select(InteractionLog)
+                .options(raiseload("*"))
+                .where(InteractionLog.timestamp >= start_date, InteractionLog.timestamp <= end_date)
+                .order_by(InteractionLog.timestamp.desc())
+            ).all()
 
     @staticmethod
     def get_logs_by_ids(log_ids):
         """Get interaction logs by a list of log IDs. Returns list in ID order."""
         if not log_ids:
             return []
-        session = get_session()
-        logs = (
-            session.query(InteractionLog)
-            .filter(InteractionLog.log_id.in_(log_ids))
-            .all()
-        )
-        session.close()
+        with SessionLocal() as session:
+            logs = session.scalars(
+                select(InteractionLog).where(InteractionLog.log_id.in_(log_ids))
+            ).all()
         # Preserve order of log_ids
         by_id = {log.log_id: log for log in logs}
         return [by_id[i] for i in log_ids if i in by_id]
 
+    @staticmethod
+    def get_chat_turns(log_ids):
+        """
+        Message, response and classification columns for the given log IDs (in ID order), as rows.
+        One IN query selecting only what a chat transcript shows, without hydrating InteractionLog objects.
+        """
+        if not log_ids:
+            return []
+        with SessionLocal() as session:
+            rows = session.execute(
+                select(
+                    InteractionLog.log_id,
+                    InteractionLog.input_message,
+                    InteractionLog.classification,
+                    InteractionLog.confidence,
+                    InteractionLog.response,
+                    InteractionLog.timestamp,
+                ).where(InteractionLog.log_id.in_(log_ids))
+            ).all()
+        by_id = {row.log_id: row for row in rows}
+        return [by_id[i] for i in log_ids if i in by_id]
+
     @staticmethod
     def get_stats(days=7):
         """Get interaction statistics for the last N days"""
-        session = get_session()
         start_date = datetime.utcnow() - timedelta(days=days)
-        
-        logs = session.query(InteractionLog).filter(
-            InteractionLog.timestamp >= start_date
-        ).all()
-        
+        # Zero/NULL confidences and processing times are excluded from the averages (NULLIF -> NULL)
+        confidence = func.nullif(InteractionLog.confidence, 0)
+        processing_time = func.nullif(InteractionLog.processing_time_ms, 0)
+        with SessionLocal() as session:
+            rows = session.execute(
+                select(
+                    InteractionLog.classification,
+                    func.count(),
+                    func.sum(confidence),
+                    func.count(confidence),
+                    func.sum(processing_time),
+                    func.count(processing_time),
+                )
+                .where(InteractionLog.timestamp >= start_date)
+                .group_by(InteractionLog.classification)
+            ).all()
+
         stats = {
-            "total_interactions": len(logs),
+            "total_interactions": 0,
             "by_classification": {},
             "avg_confidence": 0,
             "avg_processing_time_ms": 0,
         }
-        
-        if logs:
-            confidences = [log.confidence for log in logs if log.confidence]
-            processing_times = [log.processing_time_ms for log in logs if log.processing_time_ms]
-            
-            stats["avg_confidence"] = sum(confidences) / len(confidences) if confidences else 0
-            stats["avg_processing_time_ms"] = sum(processing_times) / len(processing_times) if processing_times else 0
-            
-            for log in logs:
-                classification = log.classification or "unknown"
-                stats["by_classification"][classification] = stats["by_classification"].get(classification, 0) + 1
-        
-        session.close()
+
+        confidence_sum = confidence_count = time_sum = time_count = 0
+        for classification, count, conf_sum, conf_count, ms_sum, ms_count in rows:
+            key = classification or "unknown"
+            stats["by_classification"][key] = stats["by_classification"].get(key, 0) + count
+            stats["total_interactions"] += count
+            confidence_sum += conf_sum or 0
+            confidence_count += conf_count
+            time_sum += ms_sum or 0
+            time_count += ms_count
+
+        stats["avg_confidence"] = confidence_sum / confidence_count if confidence_count else 0
+        stats["avg_processing_time_ms"] = time_sum / time_count if time_count else 0
+
         return stats
 
 
+def _insert_log_items(session, items):
+    """
+    Insert queued (row, session_id) items within an open transaction: sessionless rows with one
+    executemany, session rows one at a time so their log_ids can be appended to the session
+    """
+    plain_rows = [row for row, session_id in items if session_id is None]
+    if plain_rows:
+        session.execute(insert(InteractionLog), plain_rows)
+    session_logs = {}
+    for row, session_id in items:
+        if session_id is None:
+            continue
+        log_id = session.execute(
+            insert(InteractionLog).values(**row).returning(InteractionLog.log_id)
+        ).scalar_one()
+        session_logs.setdefault((session_id, row["customer_id"]), []).append(log_id)
+    for (session_id, customer_id), log_ids in session_logs.items():
+        _append_session_logs(session, session_id, customer_id, log_ids)
+
+
+def _write_log_rows(items):
+    """
+    Write queued items in one transaction. If that fails they are retried one per transaction,
+    so a bad row only loses itself; rows that still fail are logged and counted as dropped.
+    """
+    global _dropped_log_rows
+    try:
+        try:
+            with SessionLocal.begin() as session:
+                _insert_log_items(session, items)
+            return
+        except Exception:
+            log.exception("[LogManager] Writing %d queued interaction logs failed, retrying one by one", len(items))
+
+        dropped = 0
+        for item in items:
+            try:
+                with SessionLocal.begin() as session:
+                    _insert_log_items(session, [item])
+            except Exception:
+                dropped += 1
+                log.exception("[LogManager] Dropped a queued interaction log for customer %s", item[0].get("customer_id"))
+        if dropped:
+            with _dropped_log_rows_lock:
+                _dropped_log_rows += dropped
+    finally:
+        for _ in items:
+            _log_queue.task_done()
+
+
+def dropped_log_rows():
+    """Number of queued interaction logs that could not be written since start-up"""
+    with _dropped_log_rows_lock:
+        return _dropped_log_rows
+
+
+def _log_flusher():
+    """Background loop: collect queued rows into batches and write them"""
+    while True:
+        rows = [_log_queue.get()]
+        deadline = time.monotonic() + LOG_FLUSH_INTERVAL_SECONDS
+        while len(rows) < LOG_FLUSH_MAX_ROWS:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                rows.append(_log_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        _write_log_rows(rows)
+
+
+def _ensure_log_flusher():
+    """Start the background log flusher thread on first use"""
+    global _log_flusher_thread
+    if _log_flusher_thread is not None:
+        return
+    with _log_flusher_lock:
+        if _log_flusher_thread is None:
+            _log_flusher_thread = threading.Thread(target=_log_flusher, name="log-flusher", daemon=True)
+            _log_flusher_thread.start()
+
+
+def flush_logs():
+    """Block until every queued interaction log has been written (registered to run at exit)"""
+    if _log_flusher_thread is not None and _log_flusher_thread.is_alive():
+        _log_queue.join()
+
+
+atexit.register(flush_logs)
+
+
+def _append_session_logs(db_session, session_id, customer_id, log_ids):
+    """Append interaction log IDs to a session within an open transaction, creating the session if needed"""
+    key = (session_id, customer_id)
+    with _known_sessions_lock:
+        known = key in _known_sessions
+    if known:
+        appended = db_session.execute(
+            update(SessionHistory)
+            .where(SessionHistory.session_id == session_id)
+            .values(interaction_logs_json=_json_array_append(db_session, SessionHistory.interaction_logs_json, log_ids))
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if appended:
+            return
+        forget_session(session_id)
+
+    hist = db_session.get(SessionHistory, session_id)
+    if not hist:
+        hist = SessionHistory(
+            session_id=session_id,
+            customer_id=customer_id,
+            interaction_logs_json=[],
+            session_context={}
+        )
+        db_session.add(hist)
+    # Assign a new list: in-place changes to a JSON value aren't tracked
+    hist.interaction_logs_json = [*(hist.interaction_logs_json or []), *log_ids]
+    with _known_sessions_lock:
+        _known_sessions[key] = True
+
+
+def forget_session(session_id):
+    """Drop a session from the known-session cache (call when a session is closed or deleted)"""
+    with _known_sessions_lock:
+        for key in [key for key in _known_sessions if key[0] == session_id]:
+            del _known_sessions[key]
+
+
 class SessionManager:
     """Manage session history"""
 
     @staticmethod
     def create_session(session_id, customer_id):
         """Create a new session"""
-        session = get_session()
-        hist = SessionHistory(
-            session_id=session_id,
-            customer_id=customer_id,
-            interaction_logs_json="[]",
-            session_context="{}"
-        )
-        session.add(hist)
-        session.commit()
-        session.close()
+        with SessionLocal.begin() as session:
+            session.add(SessionHistory(
+                session_id=session_id,
+                customer_id=customer_id,
+                interaction_logs_json=[],
+                session_context={}
+            ))
 
     @staticmethod
     def get_session_history(session_id):
         """Retrieve a session by id."""
-        session = get_session()
-        hist = session.query(SessionHistory).filter_by(session_id=session_id).first()
-        session.close()
-        return hist
+        with SessionLocal() as session:
+            return session.get(SessionHistory, session_id)
 
     @staticmethod
     def list_sessions(limit=20):
         """List recent sessions (most recently accessed first)."""
-        session = get_session()
-        rows = (
-            session.query(SessionHistory)
-            .order_by(SessionHistory.last_accessed.desc())
-            .limit(limit)
-            .all()
-        )
-        session.close()
-        return rows
+        with SessionLocal() as session:
+            return session.scalars(
+                select(SessionHistory).order_by(SessionHistory.last_accessed.desc()).limit(limit)
+            ).all()
+
+    @staticmethod
+    def list_session_summaries(limit=20):
+        """
+        (session_id, log_count, last_accessed) rows for recent sessions, most recently accessed first.
+        The number of logged interactions is counted in SQL, so the ID lists are never loaded.
+        """
+        with SessionLocal() as session:
+            log_count = func.coalesce(_json_array_length(session, SessionHistory.interaction_logs_json), 0)
+            return session.execute(
+                select(SessionHistory.session_id, log_count.label("log_count"), SessionHistory.last_accessed)
+                .order_by(SessionHistory.last_accessed.desc())
+                .limit(limit)
+            ).all()
 
     @staticmethod
     def update_session_context(session_id, context_dict):
-        """Update session context"""
-        session = get_session()
-        hist = session.query(SessionHistory).filter_by(session_id=session_id).first()
-        if hist:
-            hist.session_context = json.dumps(context_dict)
-            hist.last_accessed = datetime.utcnow()
-            session.commit()
-        session.close()
+        """Update session context with a single UPDATE; returns the number of sessions updated (0 if missing)"""
+        with SessionLocal.begin() as session:
+            return session.execute(
+                update(SessionHistory)
+                .where(SessionHistory.session_id == session_id)
+                .values(session_context=context_dict)
+            ).rowcount
 
     @staticmethod
     def add_interaction_to_session(session_id, customer_id, log_id):
         """Append an interaction log ID to a session. Creates the session if it does not exist."""
-        db_session = get_session()
-        hist = db_session.query(SessionHistory).filter_by(session_id=session_id).first()
-        if not hist:
-            db_session.close()
-            SessionManager.create_session(session_id, customer_id)
-            db_session = get_session()
-            hist = db_session.query(SessionHistory).filter_by(session_id=session_id).first()
-        if hist:
-            logs_list = json.loads(hist.interaction_logs_json or "[]")
-            logs_list.append(log_id)
-            hist.interaction_logs_json = json.dumps(logs_list)
-            hist.last_accessed = datetime.utcnow()
-            db_session.commit()
-        db_session.close()
+        with SessionLocal.begin() as db_session:
+            _append_session_logs(db_session, session_id, customer_id, [log_id])
 
 
 if __name__ == "__main__":
@@ -12,11 +12,11 @@ if str(PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
 
 import html
-import json
-import uuid
+import importlib
 import streamlit as st
 import time
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 
 # Set page config
 st.set_page_config(
@@ -35,7 +35,11 @@ CREAM_TEXT = "#2D2D2D"
 CREAM_LIGHT = "#FDF5E6"
 SIDEBAR_TEXT = "#FFFBF0"  # Brighter cream/white for clear contrast on dark green
 
-st.markdown("""
+
+@st.cache_resource
+def _css_html():
+    """Theme stylesheet, formatted once per process."""
+    return """
 <style>
     /* Main app background - cream */
     .stApp, .main {
@@ -180,144 +184,367 @@ st.markdown("""
     CREAM_CARD, DARK_GREEN, CREAM_CARD, MEDIUM_GREEN, CREAM_CARD, DARK_GREEN, MEDIUM_GREEN, CREAM_LIGHT, MEDIUM_GREEN,
     MEDIUM_GREEN,
     MEDIUM_GREEN, SIDEBAR_TEXT, CREAM_CARD, DARK_GREEN, MEDIUM_GREEN, MEDIUM_GREEN, MEDIUM_GREEN,
-), unsafe_allow_html=True)
+)
+
+
+# Emitted on every run (elements a rerun doesn't re-emit are removed from the page), but never re-formatted
+st.markdown(_css_html(), unsafe_allow_html=True)
+
+
+@st.cache_resource
+def _module_cache():
+    """Imported project modules by name, shared across reruns."""
+    return {}
+
+
+def _m(name):
+    """Import a project module once; reruns get it from the cache instead of the import machinery."""
+    modules = _module_cache()
+    module = modules.get(name)
+    if module is None:
+        module = modules[name] = importlib.import_module(name)
+    return module
 
 
 @st.cache_resource
 def init_database():
     """Initialize database tables on first run."""
-    from db.database import init_db
-    init_db()
+    _m("db.database").init_db()
     return True
 
 
+def _build_workflow():
+    return importlib.import_module("workflow.workflow").build_workflow()
+
+
 @st.cache_resource
-def get_workflow():
-    """Build and cache the compiled workflow."""
-    from workflow.workflow import build_workflow
-    return build_workflow()
+def _workflow_future():
+    """Start importing LangGraph and compiling the workflow in the background when the app loads."""
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="workflow-build")
+    future = executor.submit(_build_workflow)
+    executor.shutdown(wait=False)
+    return future
 
 
+# Shown when stats can't be loaded. A plain dict: st.cache_data pickles return values (a
+# MappingProxyType can't be pickled) and hands each caller its own copy, so sharing it is safe.
+_EMPTY_STATS = {
+    "total_interactions": 0,
+    "avg_confidence": 0,
+    "by_classification": {},
+    "avg_processing_time_ms": 0,
+}
+
+
+@st.cache_data(ttl=30, show_spinner=False)
 def load_stats():
-    """Load session stats from LogManager (last 7 days)."""
+    """Load session stats from LogManager (last 7 days); cached for 30s across reruns."""
     try:
-        from db.db_utils import LogManager
-        return LogManager.get_stats(days=7)
+        return _m("db.db_utils").LogManager.get_stats(days=7)
     except Exception:
-        return {
-            "total_interactions": 0,
-            "avg_confidence": 0,
-            "by_classification": {},
-            "avg_processing_time_ms": 0,
-        }
+        return _EMPTY_STATS
 
 
+@st.cache_data(ttl=30, show_spinner=False)
 def load_session_history(session_id):
     """Load chat history for a session from the DB (interaction logs). Returns list of {message, response, ...}."""
-    from db.db_utils import SessionManager, LogManager
-    hist = SessionManager.get_session_history(session_id)
-    if not hist or not hist.interaction_logs_json:
-        return []
-    try:
-        log_ids = json.loads(hist.interaction_logs_json)
-    except Exception:
-        return []
+    db_utils = _m("db.db_utils")
+    hist = db_utils.SessionManager.get_session_history(session_id)
+    log_ids = hist.interaction_logs_json if hist else None
     if not log_ids:
         return []
-    logs = LogManager.get_logs_by_ids(log_ids)
+    turns = []
+    for row in db_utils.LogManager.get_chat_turns(log_ids):
+        message = row.input_message or ""
+        turns.append({
+            "message": message,
+            "summary": message[:80],
+            "classification": row.classification or "",
+            "confidence": row.confidence or 0,
+            "response": row.response or "",
+            "timestamp": row.timestamp.isoformat() if row.timestamp else "",
+            "_html": _bubble_html(message, row.response, row.timestamp),
+        })
+    return turns
+
+
+def _bubble_html(message, response, timestamp):
+    """
+    Escaped user/assistant bubble pair for one history entry. Built once when the entry is created
+    or loaded and stored under "_html", so reruns don't re-escape the whole transcript.
+    """
+    t = timestamp.strftime("%H:%M") if timestamp else ""
+    return (
+        f'<div class="chat-bubble chat-bubble-user">{html.escape(message or "")}<time>{t}</time></div>'
+        f'<div class="chat-bubble chat-bubble-assistant">{html.escape(response or "")}<time>{t}</time></div>'
+    )
+
+
+def build_conversation_history(history):
+    """Alternating user/assistant messages for the LLM context, built from chat history entries."""
+    conversation_history = []
+    for entry in history:
+        conversation_history.append({
+            "role": "user",
+            "content": entry.get("message", entry.get("summary", "")) or "",
+        })
+        conversation_history.append({
+            "role": "assistant",
+            "content": entry.get("response", "") or "",
+        })
+    return conversation_history
+
+
+@st.cache_data(ttl=30, show_spinner=False)
+def load_recent_sessions(limit=15):
+    """Recent sessions for the sidebar switcher as (session_id, saved message count, option label)."""
     return [
-        {
-            "message": log.input_message or "",
-            "summary": (log.input_message or "")[:80],
-            "classification": log.classification or "",
-            "confidence": log.confidence or 0,
-            "response": log.response or "",
-            "timestamp": log.timestamp.isoformat() if log.timestamp else "",
-        }
-        for log in logs
+        (sid, n, f"{sid[:8]}… ({n}) · {last_accessed.strftime('%b %d %H:%M') if last_accessed else ''}")
+        for sid, n, last_accessed in _m("db.db_utils").SessionManager.list_session_summaries(limit=limit)
     ]
 
 
+@st.fragment
+def render_sidebar():
+    """Session stats, session list and controls (its widgets rerun only this fragment until they call st.rerun)."""
+    st.markdown("### 📊 Session stats")
+    stats = load_stats()
+    st.metric("Total queries (7d)", stats["total_interactions"])
+    avg_conf = stats.get("avg_confidence") or 0
+    st.metric("Avg confidence", f"{avg_conf * 100:.0f}%")
+    by_cls = stats.get("by_classification") or {}
+    tickets_created = by_cls.get("negative_feedback", 0)
+    st.metric("Tickets created", tickets_created)
+
+    st.markdown("---")
+    st.markdown("### 📂 Sessions")
+    try:
+        current_sid = st.session_state.session_id
+        recent = load_recent_sessions(limit=15)
+        if current_sid is None:
+            current_label = "Current: (new)"
+        else:
+            # The current session is usually among the recent ones; only query it when it isn't
+            n_saved = next((n for sid, n, _ in recent if sid == current_sid), None)
+            if n_saved is None:
+                current_record = _m("db.db_utils").SessionManager.get_session_history(current_sid)
+                n_saved = len(current_record.interaction_logs_json or []) if current_record else 0
+            current_label = f"Current: {current_sid[:8]}… ({n_saved} saved)" if n_saved else f"Current: {current_sid[:8]}… (new)"
+        session_options = [current_label]
+        session_ids = [current_sid]
+        session_options.extend(label for sid, _, label in recent if sid != current_sid)
+        session_ids.extend(sid for sid, _, _ in recent if sid != current_sid)
+        chosen = st.selectbox(
+            "Switch session",
+            range(len(session_options)),
+            format_func=lambda i: session_options[i],
+            key="session_switch",
+            help="Current session is created automatically when you send your first message.",
+        )
+        if chosen is not None and chosen > 0 and session_ids[chosen] != current_sid:
+            st.session_state.session_id = session_ids[chosen]
+            st.session_state.history = load_session_history(st.session_state.session_id)
+            st.session_state.conversation_history = build_conversation_history(st.session_state.history)
+            st.session_state.last_result = None
+            st.session_state.last_error = None
+            st.rerun()
+    except Exception as e:
+        st.caption(f"Session: {st.session_state.session_id[:8]}…" if st.session_state.session_id else "Session: (new)")
+        st.caption("(Could not load session list)")
+
+    if st.button("New session", use_container_width=True, help="Start a new conversation session (saved when you send a message)"):
+        st.session_state.session_id = None
+        st.session_state.history = []
+        st.session_state.conversation_history = []
+        st.session_state.last_result = None
+        st.session_state.last_error = None
+        st.rerun()
+    if st.button("Clear history", use_container_width=True):
+        st.session_state.history = []
+        st.session_state.conversation_history = []
+        st.session_state.last_result = None
+        st.session_state.last_error = None
+        st.rerun()
+
+
+# Transcripts with at least this many turns use st.chat_message instead of the themed HTML bubbles
+CHAT_HTML_MAX_ENTRIES = 10
+
+
+def render_chat_history():
+    """Chat history as bubbles."""
+    history = st.session_state.history
+    if len(history) >= CHAT_HTML_MAX_ENTRIES:
+        # Long transcripts: native chat containers, no custom HTML to sanitize per bubble. st.text
+        # shows the literal text, like the escaped HTML bubbles (st.write would render it as markdown)
+        for entry in history:
+            t = entry.get("timestamp", "")[11:16]
+            with st.chat_message("user"):
+                st.text(entry.get("message", entry.get("summary", "")) or "")
+                st.caption(t)
+            with st.chat_message("assistant"):
+                st.text(entry.get("response", "") or "")
+                st.caption(t)
+    elif history:
+        # All bubbles in one markdown element instead of two per turn
+        st.markdown(
+            "".join(
+                entry.get("_html") or _bubble_html(entry.get("message", entry.get("summary", "")), entry.get("response"), None)
+                for entry in history
+            ),
+            unsafe_allow_html=True,
+        )
+    else:
+        st.markdown(
+            '<div class="chat-container"><p style="color: %s;">No messages yet. Send a message below.</p></div>'
+            % DARK_GREEN,
+            unsafe_allow_html=True,
+        )
+
+
+# Result fields shown in the right panel, in the order render_right_panel unpacks them
+DEBUG_KEYS = (
+    "classified_type",
+    "classification_confidence",
+    "extracted_topic",
+    "agent_name",
+    "ticket_id",
+    "ticket_status",
+    "processing_time_ms",
+)
+
+
+@st.fragment
+def render_right_panel():
+    """Current result stats, details and debug."""
+    st.markdown("""
+        <div class="right-panel">
+            <h3 style="color: %s;">📋 Current response</h3>
+        </div>
+    """ % DARK_GREEN, unsafe_allow_html=True)
+
+    if st.session_state.last_error:
+        st.error("An error occurred: " + st.session_state.last_error)
+
+    result = st.session_state.last_result
+    if result:
+        values = [result.get(key) for key in DEBUG_KEYS]
+        classified_type, conf, topic, agent_name, ticket_id, ticket_status, ms = values
+        classified_label = classified_type or "—"
+        st.metric("Classification", classified_label)
+        st.metric("Confidence", f"{conf * 100:.0f}%" if conf is not None else "—")
+        st.metric("Time", f"{ms} ms" if ms is not None else "—")
+        status = "✅ Success" if not st.session_state.last_error else "⚠️ Issues"
+        st.metric("Status", status)
+
+        st.markdown("**Details**")
+        st.caption(f"Classification: {classified_label}")
+        st.caption(f"Topic: {topic or '—'}")
+        st.caption(f"Handler: {agent_name or '—'}")
+        if ticket_id:
+            st.caption(f"Ticket ID: {ticket_id}")
+        if ticket_status:
+            st.caption(f"Ticket status: {ticket_status}")
+
+        with st.expander("Debug"):
+            # Expander content is sent even while collapsed, so the JSON is only built on request
+            if st.checkbox("Show debug JSON", key="_debug_open"):
+                import json
+                st.code(json.dumps(dict(zip(DEBUG_KEYS, values)), indent=2, default=str), language="json")
+    else:
+        st.caption("Submit a message to see classification, metrics and debug here.")
+
+
+# Seconds between reruns while a submitted workflow is still running
+PENDING_POLL_SECONDS = 0.2
+
+
+@st.cache_resource
+def _executor():
+    """Worker threads that run workflow invocations off the script thread."""
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix="workflow")
+
+
+def _run_workflow(workflow_future, payload, streamed):
+    """Invoke the workflow on a worker thread, appending the response text to ``streamed`` as it is generated."""
+    workflow = workflow_future.result()
+    with importlib.import_module("agents.handlers").stream_response_to(streamed.append):
+        return workflow.invoke(payload)
+
+
+def _finish_submit(pending):
+    """Record a finished workflow run in session state (history, LLM context, last result or error)."""
+    try:
+        result = pending["future"].result()
+    except Exception as e:
+        # Don't keep a failed workflow build cached; the next submit starts a fresh one
+        build = _workflow_future()
+        if build.done() and build.exception() is not None:
+            _workflow_future.clear()
+        st.session_state.last_error = str(e)
+        st.session_state.last_result = None
+        return
+
+    # Use workflow-computed processing time (includes all nodes); fall back to UI timing
+    if not result.get("processing_time_ms"):
+        result["processing_time_ms"] = (time.perf_counter_ns() - pending["start"]) // 1_000_000
+    # The run wrote its log synchronously (log_synchronously), so the reloaded caches include this turn
+    load_stats.clear()
+    load_session_history.clear()
+    load_recent_sessions.clear()
+    if pending["session_id"] != st.session_state.session_id:
+        # The user switched sessions meanwhile; the turn is saved to its own session in the DB
+        return
+
+    st.session_state.last_result = result
+    st.session_state.last_error = None
+    message = pending["message"]
+    response = result.get("response", "") or ""
+    now = datetime.now()
+    st.session_state.history.append({
+        "message": message,
+        "summary": message[:80],
+        "classification": result.get("classified_type", ""),
+        "confidence": result.get("classification_confidence", 0),
+        "response": response,
+        "timestamp": now.isoformat(),
+        "_html": _bubble_html(message, response, now),
+    })
+    st.session_state.conversation_history.extend([
+        {"role": "user", "content": message},
+        {"role": "assistant", "content": response},
+    ])
+
+
 def main():
     # Initialize database tables on startup (creates tables if they don't exist)
     init_database()
+    _workflow_future()
     
     # Session state for history, last result, and DB session (for SessionManager)
     if "history" not in st.session_state:
         st.session_state.history = []
+    # LLM context for the current session, extended by one user/assistant pair per submit
+    if "conversation_history" not in st.session_state:
+        st.session_state.conversation_history = build_conversation_history(st.session_state.history)
     if "last_result" not in st.session_state:
         st.session_state.last_result = None
     if "last_error" not in st.session_state:
         st.session_state.last_error = None
+    # Allocated on the first submit, so visitors who never send a message don't get one
     if "session_id" not in st.session_state:
-        st.session_state.session_id = str(uuid.uuid4())
+        st.session_state.session_id = None
+
+    # Workflow submitted on an earlier run: pick up its result once it has finished
+    pending = st.session_state.get("_pending")
+    if pending is not None and pending["future"].done():
+        del st.session_state["_pending"]
+        _finish_submit(pending)
+        pending = None
 
     # Sidebar (left) – session stats, session list, and controls
     with st.sidebar:
-        st.markdown("### 📊 Session stats")
-        stats = load_stats()
-        st.metric("Total queries (7d)", stats["total_interactions"])
-        avg_conf = stats.get("avg_confidence") or 0
-        st.metric("Avg confidence", f"{avg_conf * 100:.0f}%")
-        by_cls = stats.get("by_classification") or {}
-        tickets_created = by_cls.get("negative_feedback", 0)
-        st.metric("Tickets created", tickets_created)
-
-        st.markdown("---")
-        st.markdown("### 📂 Sessions")
-        try:
-            from db.db_utils import SessionManager
-            current_sid = st.session_state.session_id
-            current_record = SessionManager.get_session_history(current_sid)
-            if current_record and current_record.interaction_logs_json:
-                try:
-                    n_saved = len(json.loads(current_record.interaction_logs_json))
-                except Exception:
-                    n_saved = 0
-            else:
-                n_saved = 0
-            current_label = f"Current: {current_sid[:8]}… ({n_saved} saved)" if n_saved else f"Current: {current_sid[:8]}… (new)"
-            recent = SessionManager.list_sessions(limit=15)
-            session_options = [current_label]
-            session_ids = [current_sid]
-            for row in recent:
-                if row.session_id == current_sid:
-                    continue
-                try:
-                    n = len(json.loads(row.interaction_logs_json or "[]"))
-                except Exception:
-                    n = 0
-                ts = row.last_accessed.strftime("%b %d %H:%M") if getattr(row, "last_accessed", None) else ""
-                session_options.append(f"{row.session_id[:8]}… ({n}) · {ts}")
-                session_ids.append(row.session_id)
-            chosen = st.selectbox(
-                "Switch session",
-                range(len(session_options)),
-                format_func=lambda i: session_options[i],
-                key="session_switch",
-                help="Current session is created automatically when you send your first message.",
-            )
-            if chosen is not None and chosen > 0 and session_ids[chosen] != current_sid:
-                st.session_state.session_id = session_ids[chosen]
-                st.session_state.history = load_session_history(st.session_state.session_id)
-                st.session_state.last_result = None
-                st.session_state.last_error = None
-                st.rerun()
-        except Exception as e:
-            st.caption(f"Session: {st.session_state.session_id[:8]}…")
-            st.caption("(Could not load session list)")
-
-        if st.button("New session", use_container_width=True, help="Start a new conversation session (saved when you send a message)"):
-            st.session_state.session_id = str(uuid.uuid4())
-            st.session_state.history = []
-            st.session_state.last_result = None
-            st.session_state.last_error = None
-            st.rerun()
-        if st.button("Clear history", use_container_width=True):
-            st.session_state.history = []
-            st.session_state.last_result = None
-            st.session_state.last_error = None
-            st.rerun()
+        render_sidebar()
 
     # No customer dropdown: use a single default so identity can come from the message (e.g. QueryAgent looks up by name in message)
     DEFAULT_CUSTOMER_ID = "GUEST"
@@ -337,33 +564,10 @@ def main():
             <h2 style="color: %s; margin-bottom: 8px;">💬 Conversation</h2>
         """ % DARK_GREEN, unsafe_allow_html=True)
 
-        # Chat history as bubbles
-        history = st.session_state.history
-        if history:
-            for entry in history:
-                user_msg = entry.get("message", entry.get("summary", "")) or ""
-                asst_msg = entry.get("response", "") or ""
-                ts = entry.get("timestamp", "")
-                try:
-                    t = datetime.fromisoformat(ts).strftime("%H:%M") if ts else ""
-                except Exception:
-                    t = ""
-                st.markdown(
-                    '<div class="chat-bubble chat-bubble-user">%s<time>%s</time></div>'
-                    % (html.escape(user_msg), html.escape(t)),
-                    unsafe_allow_html=True,
-                )
-                st.markdown(
-                    '<div class="chat-bubble chat-bubble-assistant">%s<time>%s</time></div>'
-                    % (html.escape(asst_msg), html.escape(t)),
-                    unsafe_allow_html=True,
-                )
-        else:
-            st.markdown(
-                '<div class="chat-container"><p style="color: %s;">No messages yet. Send a message below.</p></div>'
-                % DARK_GREEN,
-                unsafe_allow_html=True,
-            )
+        render_chat_history()
+        if pending is not None:
+            with st.status("Classifying and routing…", state="running"):
+                st.markdown("".join(pending["streamed"]) or "…")
 
         # Input area
         st.markdown('<div class="chat-input-area">', unsafe_allow_html=True)
@@ -374,96 +578,46 @@ def main():
             key="message",
             label_visibility="visible",
         )
-        submit = st.button("Submit", type="primary", use_container_width=True)
+        submit = st.button("Submit", type="primary", use_container_width=True, disabled=pending is not None)
         st.markdown("</div>", unsafe_allow_html=True)
 
     if submit:
         if not message or not message.strip():
             st.error("Please enter a message.")
         else:
-            with st.spinner("Classifying and routing…"):
-                start = time.perf_counter()
-                try:
-                    # Build conversation history for LLM context (prior turns in this session)
-                    conversation_history = []
-                    for entry in st.session_state.history:
-                        conversation_history.append({
-                            "role": "user",
-                            "content": entry.get("message", entry.get("summary", "")) or "",
-                        })
-                        conversation_history.append({
-                            "role": "assistant",
-                            "content": entry.get("response", "") or "",
-                        })
-                    workflow = get_workflow()
-                    result = workflow.invoke({
-                        "user_input": message.strip(),
-                        "customer_id": DEFAULT_CUSTOMER_ID,
-                        "customer_name": DEFAULT_CUSTOMER_NAME,
-                        "session_id": st.session_state.session_id,
-                        "conversation_history": conversation_history,
-                    })
-                    # Use workflow-computed processing time (includes all nodes); fall back to UI timing
-                    if not result.get("processing_time_ms"):
-                        result["processing_time_ms"] = int((time.perf_counter() - start) * 1000)
-                    st.session_state.last_result = result
-                    st.session_state.last_error = None
-                    st.session_state.history.append({
-                        "message": message.strip(),
-                        "summary": message.strip()[:80],
-                        "classification": result.get("classified_type", ""),
-                        "confidence": result.get("classification_confidence", 0),
-                        "response": result.get("response", ""),
-                        "timestamp": datetime.now().isoformat(),
-                    })
-                except Exception as e:
-                    st.session_state.last_error = str(e)
-                    st.session_state.last_result = None
-
+            if st.session_state.session_id is None:
+                import uuid
+                st.session_state.session_id = uuid.uuid4().hex
+            text = message.strip()
+            streamed = []
+            payload = {
+                "user_input": text,
+                "customer_id": DEFAULT_CUSTOMER_ID,
+                "customer_name": DEFAULT_CUSTOMER_NAME,
+                "session_id": st.session_state.session_id,
+                # Prior turns in this session; the workflow only reads it
+                "conversation_history": st.session_state.conversation_history,
+                # Written on the worker thread before the run returns, so _finish_submit can refresh
+                # the cached stats/history without waiting on the shared write-behind queue
+                "log_synchronously": True,
+            }
+            st.session_state._pending = {
+                "future": _executor().submit(_run_workflow, _workflow_future(), payload, streamed),
+                "message": text,
+                "session_id": st.session_state.session_id,
+                "streamed": streamed,
+                "start": time.perf_counter_ns(),
+            }
             st.rerun()
 
     # Right panel (~25%%) – current result stats, details, debug
     with col_right:
-        st.markdown("""
-            <div class="right-panel">
-                <h3 style="color: %s;">📋 Current response</h3>
-            </div>
-        """ % DARK_GREEN, unsafe_allow_html=True)
+        render_right_panel()
 
-        if st.session_state.last_error:
-            st.error("An error occurred: " + st.session_state.last_error)
-
-        result = st.session_state.last_result
-        if result:
-            st.metric("Classification", result.get("classified_type", "—"))
-            conf = result.get("classification_confidence")
-            st.metric("Confidence", f"{conf * 100:.0f}%" if conf is not None else "—")
-            ms = result.get("processing_time_ms")
-            st.metric("Time", f"{ms} ms" if ms is not None else "—")
-            status = "✅ Success" if not st.session_state.last_error else "⚠️ Issues"
-            st.metric("Status", status)
-
-            st.markdown("**Details**")
-            st.caption("Classification: " + str(result.get("classified_type") or "—"))
-            st.caption("Topic: " + str(result.get("extracted_topic") or "—"))
-            st.caption("Handler: " + str(result.get("agent_name") or "—"))
-            if result.get("ticket_id"):
-                st.caption("Ticket ID: " + str(result.get("ticket_id")))
-            if result.get("ticket_status"):
-                st.caption("Ticket status: " + str(result.get("ticket_status")))
-
-            with st.expander("Debug"):
-                st.json({
-                    "classified_type": result.get("classified_type"),
-                    "classification_confidence": result.get("classification_confidence"),
-                    "extracted_topic": result.get("extracted_topic"),
-                    "agent_name": result.get("agent_name"),
-                    "ticket_id": result.get("ticket_id"),
-                    "ticket_status": result.get("ticket_status"),
-                    "processing_time_ms": result.get("processing_time_ms"),
-                })
-        else:
-            st.caption("Submit a message to see classification, metrics and debug here.")
+    if pending is not None:
+        # Poll the running workflow; each rerun shows the response streamed so far
+        time.sleep(PENDING_POLL_SECONDS)
+        st.rerun()
 
 
 if __name__ == "__main__":
@@ -8,26 +8,98 @@ Usage:
     python -m tests.test_runner --tag positive     # Run tests with specific tag
     python -m tests.test_runner --quick            # Run first 10 tests only
     python -m tests.test_runner --report report.md # Save report to file
+    python -m tests.test_runner --workers 4        # Run 4 test cases concurrently
+    python -m tests.test_runner --quiet            # Progress line on stderr instead of per-test output
+    python -m tests.test_runner --classifier-model gpt-4o  # Compare classification against another model
+    python -m tests.test_runner --prefilter        # Enable the keyword prefilter (CLASSIFICATION_PREFILTER)
+    python -m tests.test_runner --strict-llm       # Classify every input with the LLM (no keyword prefilter)
+    python -m tests.test_runner --prefilter-check  # Check the keyword prefilter rules offline (no API calls)
+    python -m tests.test_runner --cache            # Reuse stored results of unchanged cases (local iteration only)
+    python -m tests.test_runner --semantic-cache   # Reuse classifications of near-duplicate inputs
 """
 
 import sys
 import json
 import time
+import hashlib
+import heapq
+import sqlite3
 import argparse
+import asyncio
+import io
+import logging
+import math
+import re
 from pathlib import Path
 from dataclasses import dataclass, field
 from typing import Optional
-from collections import defaultdict
+from collections import Counter
+
+import numpy as np
+
+# orjson parses large test-case files several times faster; it is optional
+try:
+    from orjson import loads as _json_loads
+except ImportError:
+    _json_loads = json.loads
+
+# Processing-time histogram: 20 log-spaced buckets per decade from 0.1 ms up (~12% wide each)
+HIST_BUCKETS = 200
+HIST_BUCKETS_PER_DECADE = 20
+
+
+def _time_bucket(ms: int) -> int:
+    """Histogram bucket of a processing time."""
+    return min(HIST_BUCKETS - 1, int((math.log10(max(ms, 1)) + 1) * HIST_BUCKETS_PER_DECADE))
+
+
+def _bucket_value(bucket: int) -> float:
+    """Representative time of a bucket (geometric midpoint of its range)."""
+    return 10 ** ((bucket + 0.5) / HIST_BUCKETS_PER_DECADE - 1)
 
 # Add project root to path
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
 if str(PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
 
-from workflow.workflow import build_workflow, CONFIDENCE_THRESHOLD
+# With --cache, workflow results persist across runs, keyed by every classification setting (model,
+# prompt, prefilter / fast path / draft / semantic cache toggles, escalation threshold) + input, so
+# reruns only invoke the workflow for new or changed cases. The version hashes the routing and agent
+# code, so any edit to them invalidates every stored result. Off by default, so CI never replays results.
+WORKFLOW_CACHE_PATH = PROJECT_ROOT / "tests" / ".workflow_cache" / "results.sqlite3"
+WORKFLOW_CACHE_SOURCES = (
+    PROJECT_ROOT / "workflow" / "workflow.py",
+    PROJECT_ROOT / "agents" / "handlers.py",
+)
+
 
+def _workflow_cache_version() -> str:
+    """Hash of the workflow and agent sources that decide routing and responses."""
+    digest = hashlib.blake2b(digest_size=8)
+    for source in WORKFLOW_CACHE_SOURCES:
+        digest.update(source.read_bytes())
+    return digest.hexdigest()
 
-@dataclass
+TEST_CUSTOMER_ID = "TEST_USER"
+
+# With --quiet, refresh the one-line stderr progress display every this many finished tests
+PROGRESS_EVERY = 10
+
+# Failed cases kept for the report: the earliest ones in test-case order (failed_tests has the full count)
+FAILED_CASES_KEPT = 100
+
+# Handler name the workflow reports for escalated cases
+HANDLER_ESCALATION = sys.intern("EscalationAgent")
+
+# Cases with this tag must never be answered by the keyword prefilter (negation, sarcasm, ...)
+TAG_PREFILTER_GUARD = "prefilter_guard"
+_HIT_RATE_RE = re.compile(r"fast_classify_hit_rate=([0-9.]+)")
+
+# workflow.workflow (langgraph, openai, pydantic, .env) is imported where it is first needed, so
+# --help and argument / test-file errors exit without paying for it
+
+
+@dataclass(slots=True)
 class TestResult:
     """Result of a single test case."""
     test_id: str
@@ -49,15 +121,17 @@ class TestResult:
     passed: bool
     error: Optional[str] = None
     tags: list = field(default_factory=list)
+    from_cache: bool = False  # Replayed from the result cache; its processing time is not a fresh measurement
 
 
-@dataclass
+@dataclass(slots=True)
 class EvaluationReport:
     """Aggregated evaluation metrics."""
     total_tests: int = 0
     passed_tests: int = 0
     failed_tests: int = 0
     error_tests: int = 0
+    cached_tests: int = 0
     
     classification_correct: int = 0
     classification_total: int = 0
@@ -71,13 +145,28 @@ class EvaluationReport:
     confidence_in_range: int = 0
     confidence_total: int = 0
     
+    # Processing times are kept as a fixed-size histogram (O(1) memory in the number of tests);
+    # raw samples are only kept with keep_raw (--keep-raw), which makes percentiles exact.
+    # Only freshly run cases are timed: cached results replay an earlier run's timing
+    processing_time_count: int = 0
+    processing_time_sum: int = 0
+    processing_time_hist: np.ndarray = field(default_factory=lambda: np.zeros(HIST_BUCKETS, dtype=np.int64))
+    keep_raw: bool = False
     processing_times_ms: list = field(default_factory=list)
     
-    by_classification: dict = field(default_factory=lambda: defaultdict(lambda: {"correct": 0, "total": 0}))
-    by_tag: dict = field(default_factory=lambda: defaultdict(lambda: {"passed": 0, "total": 0}))
+    # Per-category rollups as parallel counters (keyed by expected classification / tag)
+    by_classification_correct: Counter = field(default_factory=Counter)
+    by_classification_total: Counter = field(default_factory=Counter)
+    by_tag_passed: Counter = field(default_factory=Counter)
+    by_tag_total: Counter = field(default_factory=Counter)
     
+    # While running: heap of (-test index, result) bounded to FAILED_CASES_KEPT; afterwards the
+    # kept results in test-case order
     failed_cases: list = field(default_factory=list)
     
+    # (sample count, (p50, p95)) from the last percentile computation
+    _percentile_cache: Optional[tuple] = field(default=None, repr=False, compare=False)
+    
     @property
     def classification_accuracy(self) -> float:
         return self.classification_correct / self.classification_total if self.classification_total else 0
@@ -98,31 +187,83 @@ class EvaluationReport:
     def pass_rate(self) -> float:
         return self.passed_tests / self.total_tests if self.total_tests else 0
     
+    def add_processing_time(self, ms: int) -> None:
+        """Record one processing time."""
+        self.processing_time_count += 1
+        self.processing_time_sum += ms
+        self.processing_time_hist[_time_bucket(ms)] += 1
+        if self.keep_raw:
+            self.processing_times_ms.append(ms)
+    
     @property
     def avg_processing_time_ms(self) -> float:
-        return sum(self.processing_times_ms) / len(self.processing_times_ms) if self.processing_times_ms else 0
+        return self.processing_time_sum / self.processing_time_count if self.processing_time_count else 0
+    
+    def _compute_percentiles(self) -> tuple[float, float]:
+        """
+        (p50, p95), recomputed only after new samples are added. Exact (one O(n) np.partition) when
+        raw samples are kept, otherwise read off the histogram's cumulative counts in O(buckets).
+        """
+        n = self.processing_time_count
+        if self._percentile_cache is None or self._percentile_cache[0] != n:
+            if not n:
+                percentiles = (0, 0)
+            else:
+                idx = [n // 2, min(int(n * 0.95), n - 1)]
+                if self.keep_raw:
+                    part = np.partition(np.asarray(self.processing_times_ms), idx)
+                    percentiles = (part[idx[0]].item(), part[idx[1]].item())
+                else:
+                    # First bucket whose cumulative count passes each 0-based rank
+                    buckets = np.searchsorted(np.cumsum(self.processing_time_hist), np.asarray(idx), side="right")
+                    percentiles = tuple(_bucket_value(int(bucket)) for bucket in buckets)
+            self._percentile_cache = (n, percentiles)
+        return self._percentile_cache[1]
     
     @property
     def p50_processing_time_ms(self) -> float:
-        if not self.processing_times_ms:
-            return 0
-        sorted_times = sorted(self.processing_times_ms)
-        idx = len(sorted_times) // 2
-        return sorted_times[idx]
+        return self._compute_percentiles()[0]
     
     @property
     def p95_processing_time_ms(self) -> float:
-        if not self.processing_times_ms:
-            return 0
-        sorted_times = sorted(self.processing_times_ms)
-        idx = int(len(sorted_times) * 0.95)
-        return sorted_times[min(idx, len(sorted_times) - 1)]
+        return self._compute_percentiles()[1]
+
+
+class WorkflowResultCache:
+    """
+    sqlite3 store of the workflow fields a test result needs, keyed by a blake2b hash of
+    (workflow source hash, classification settings, input, customer). Only the runner's main thread uses it.
+    """
+    
+    def __init__(self, path: Path, settings: dict):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, result TEXT NOT NULL)")
+        self._prefix = f"{_workflow_cache_version()}|{json.dumps(settings, sort_keys=True)}|"
+    
+    def _key(self, user_input: str, customer_id: str) -> str:
+        return hashlib.blake2b(f"{self._prefix}{user_input}|{customer_id}".encode(), digest_size=16).hexdigest()
+    
+    def get(self, user_input: str, customer_id: str) -> Optional[dict]:
+        row = self._conn.execute(
+            "SELECT result FROM results WHERE key = ?", (self._key(user_input, customer_id),)
+        ).fetchone()
+        return _json_loads(row[0]) if row else None
+    
+    def put(self, user_input: str, customer_id: str, result: dict) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO results (key, result) VALUES (?, ?)",
+            (self._key(user_input, customer_id), json.dumps(result)),
+        )
+    
+    def close(self) -> None:
+        self._conn.commit()
+        self._conn.close()
 
 
 def load_test_cases(path: Path, tag_filter: Optional[str] = None) -> list[dict]:
     """Load test cases from JSON file, optionally filtering by tag."""
-    with open(path) as f:
-        data = json.load(f)
+    data = _json_loads(path.read_bytes())
     
     cases = data.get("test_cases", [])
     
@@ -132,39 +273,65 @@ def load_test_cases(path: Path, tag_filter: Optional[str] = None) -> list[dict]:
     return cases
 
 
-def run_single_test(workflow, test_case: dict) -> TestResult:
-    """Run a single test case through the workflow."""
+def _workflow_input(test_case: dict) -> dict:
+    return {
+        "user_input": test_case["input"],
+        "customer_id": TEST_CUSTOMER_ID,
+        "customer_name": "Test User",
+    }
+
+
+def run_single_test(workflow, test_case: dict, cached: Optional[dict] = None) -> TestResult:
+    """Run a single test case through the workflow (or evaluate a cached workflow result)."""
+    if cached is not None:
+        return evaluate_test(test_case, cached, from_cache=True)
+    try:
+        return evaluate_test(test_case, workflow.invoke(_workflow_input(test_case)))
+    except Exception as e:
+        return evaluate_test(test_case, None, error=str(e))
+
+
+async def run_single_test_async(workflow, test_case: dict, cached: Optional[dict] = None) -> TestResult:
+    """Async version of run_single_test using workflow.ainvoke."""
+    if cached is not None:
+        return evaluate_test(test_case, cached, from_cache=True)
+    try:
+        return evaluate_test(test_case, await workflow.ainvoke(_workflow_input(test_case)))
+    except Exception as e:
+        return evaluate_test(test_case, None, error=str(e))
+
+
+def evaluate_test(
+    test_case: dict, result: Optional[dict], error: Optional[str] = None, from_cache: bool = False
+) -> TestResult:
+    """
+    Score one workflow result (None when the run raised ``error``) against its test case;
+    ``from_cache`` marks a result replayed from the persistent result cache.
+    """
     test_id = test_case["id"]
     input_text = test_case["input"]
-    expected_classification = test_case["expected_classification"]
-    expected_handler = test_case["expected_handler"]
+    # Interned so comparisons against the workflow's (literal, hence interned) names and the
+    # per-class rollup keys hit str's identity fast path instead of comparing bytes
+    expected_classification = sys.intern(test_case["expected_classification"])
+    expected_handler = sys.intern(test_case["expected_handler"])
     min_confidence = test_case.get("min_confidence")
     max_confidence = test_case.get("max_confidence")
     expect_escalation = test_case.get("expect_escalation", False)
-    tags = test_case.get("tags", [])
+    # Tags repeat across many cases; intern them too so every result shares one copy
+    tags = [sys.intern(tag) for tag in test_case.get("tags", [])]
     
-    error = None
     actual_classification = ""
     actual_handler = ""
     actual_confidence = 0.0
     was_escalated = False
     processing_time_ms = 0
     
-    try:
-        result = workflow.invoke({
-            "user_input": input_text,
-            "customer_id": "TEST_USER",
-            "customer_name": "Test User",
-        })
-        
+    if result is not None:
         actual_classification = result.get("classified_type", "")
         actual_handler = result.get("agent_name", "")
         actual_confidence = result.get("classification_confidence", 0.0)
         processing_time_ms = result.get("processing_time_ms", 0)
-        was_escalated = actual_handler == "EscalationAgent"
-        
-    except Exception as e:
-        error = str(e)
+        was_escalated = actual_handler == HANDLER_ESCALATION
     
     # Evaluate results
     classification_correct = actual_classification == expected_classification
@@ -205,157 +372,366 @@ def run_single_test(workflow, test_case: dict) -> TestResult:
         passed=passed,
         error=error,
         tags=tags,
+        from_cache=from_cache,
     )
 
 
-def run_evaluation(test_cases: list[dict], verbose: bool = True) -> tuple[list[TestResult], EvaluationReport]:
-    """Run all test cases and generate evaluation report."""
+def record_result(
+    report: EvaluationReport, result: TestResult, verbose: bool = True, label: str = "", index: Optional[int] = None
+) -> None:
+    """
+    Add one test result's outcome, timing and rollups to the report (and print its verbose line).
+    The per-check accuracy counts are filled in once at the end by summarize_flags.
+    ``index`` is the case's position in the test file (defaults to arrival order).
+    """
+    # Update report
+    report.total_tests += 1
+    
+    if result.error:
+        report.error_tests += 1
+        if verbose:
+            print(f"{label}❌ ERROR: {result.error[:50]}")
+    elif result.passed:
+        report.passed_tests += 1
+        if verbose:
+            print(f"{label}✅ PASS ({result.actual_classification}, {result.actual_confidence:.2f})")
+    else:
+        report.failed_tests += 1
+        entry = (-(report.total_tests if index is None else index), result)
+        if len(report.failed_cases) < FAILED_CASES_KEPT:
+            heapq.heappush(report.failed_cases, entry)
+        elif entry[0] > report.failed_cases[0][0]:
+            heapq.heapreplace(report.failed_cases, entry)
+        if verbose:
+            issues = []
+            if not result.classification_correct:
+                issues.append(f"class: {result.actual_classification}")
+            if not result.handler_correct:
+                issues.append(f"handler: {result.actual_handler}")
+            if not result.escalation_correct:
+                issues.append(f"escalation: {result.was_escalated}")
+            print(f"{label}❌ FAIL ({', '.join(issues)})")
+    
+    # Processing time (cached results carry an earlier run's timing, so they are only counted)
+    if result.from_cache:
+        report.cached_tests += 1
+    elif result.processing_time_ms > 0:
+        report.add_processing_time(result.processing_time_ms)
+    
+    # By classification
+    expected_classification = result.expected_classification
+    report.by_classification_total[expected_classification] += 1
+    if result.classification_correct:
+        report.by_classification_correct[expected_classification] += 1
+    
+    # By tag
+    if result.tags:
+        report.by_tag_total.update(result.tags)
+        if result.passed:
+            report.by_tag_passed.update(result.tags)
+
+
+# One row per test result: the per-check flags summarize_flags aggregates
+RESULT_FLAGS_DTYPE = np.dtype([
+    ("classification_correct", np.bool_),
+    ("handler_correct", np.bool_),
+    ("escalation_scored", np.bool_),
+    ("escalation_correct", np.bool_),
+    ("confidence_scored", np.bool_),
+    ("confidence_in_range", np.bool_),
+])
+
+
+def result_flags(results: list[TestResult]) -> np.ndarray:
+    """Pack the results' check flags into a structured array (one pass over the results)."""
+    return np.fromiter(
+        (
+            (
+                r.classification_correct,
+                r.handler_correct,
+                # Escalation is scored where it was expected or happened; confidence where a bound was given
+                r.expect_escalation or r.was_escalated,
+                r.escalation_correct,
+                r.expected_confidence_min is not None or r.expected_confidence_max is not None,
+                r.confidence_in_range,
+            )
+            for r in results
+        ),
+        dtype=RESULT_FLAGS_DTYPE,
+        count=len(results),
+    )
+
+
+def summarize_flags(report: EvaluationReport, results: list[TestResult]) -> None:
+    """Fill in the classification / handler / escalation / confidence counts from all results at once."""
+    flags = result_flags(results)
+    
+    report.classification_total = report.handler_total = len(flags)
+    report.classification_correct = int(flags["classification_correct"].sum())
+    report.handler_correct = int(flags["handler_correct"].sum())
+    
+    report.escalation_total = int(flags["escalation_scored"].sum())
+    report.escalation_correct = int((flags["escalation_scored"] & flags["escalation_correct"]).sum())
+    
+    report.confidence_total = int(flags["confidence_scored"].sum())
+    report.confidence_in_range = int((flags["confidence_scored"] & flags["confidence_in_range"]).sum())
+
+
+class _MessageCollector(logging.Handler):
+    """Logging handler keeping the formatted messages it receives."""
+    
+    def __init__(self):
+        super().__init__(logging.INFO)
+        self.messages = []
+    
+    def emit(self, record: logging.LogRecord) -> None:
+        self.messages.append(record.getMessage())
+
+
+def check_prefilter(test_cases: list[dict]) -> list[str]:
+    """
+    Check the keyword prefilter against the test cases without any API calls. Every case it answers
+    must get the expected classification, confidence bounds and escalation; prefilter_guard
+    cases must fall through to the LLM; and the fast_classify_hit_rate that emit_metrics logs must
+    equal the share of cases the prefilter answered. Returns the problems found (empty when clean).
+    """
+    import workflow.workflow as workflow_module
+    
+    workflow_module.CLASSIFICATION_PREFILTER_ENABLED = True
+    collector = _MessageCollector()
+    metrics_log = workflow_module.metrics_log
+    previous_level = metrics_log.level
+    metrics_log.addHandler(collector)
+    metrics_log.setLevel(logging.INFO)
+    
+    problems = []
+    hits = 0
+    try:
+        for test_case in test_cases:
+            test_id = test_case["id"]
+            if workflow_module._prefilter_classify(test_case["input"]) is None:
+                # Falls through to the LLM; record it the way classify_message would
+                workflow_module.record_classification_source("llm")
+                workflow_module.emit_metrics({"classification_source": "llm"})
+                continue
+            
+            hits += 1
+            # The prefilter answers inside the real node, so no LLM call is made here
+            state = workflow_module.classify_message(_workflow_input(test_case))
+            workflow_module.emit_metrics(state)
+            if TAG_PREFILTER_GUARD in test_case.get("tags", []):
+                problems.append(f"{test_id}: must go to the LLM but the prefilter answered {state['classified_type']}")
+                continue
+            classified_type = state["classified_type"]
+            confidence = state["classification_confidence"]
+            min_confidence = test_case.get("min_confidence")
+            max_confidence = test_case.get("max_confidence")
+            escalated = confidence < workflow_module.CONFIDENCE_THRESHOLD
+            if (
+                classified_type != test_case["expected_classification"]
+                or (min_confidence is not None and confidence < min_confidence)
+                or (max_confidence is not None and confidence > max_confidence)
+                or escalated != test_case.get("expect_escalation", False)
+            ):
+                problems.append(
+                    f"{test_id}: prefilter answered {classified_type} ({confidence:.2f}), "
+                    f"expected {test_case['expected_classification']}"
+                )
+    finally:
+        metrics_log.removeHandler(collector)
+        metrics_log.setLevel(previous_level)
+    
+    rates = [match.group(1) for match in map(_HIT_RATE_RE.search, collector.messages) if match]
+    expected_rate = f"{hits / len(test_cases):.3f}" if test_cases else "0.000"
+    if len(rates) != len(test_cases):
+        problems.append(f"fast_classify_hit_rate was emitted for {len(rates)} of {len(test_cases)} messages")
+    elif rates and rates[-1] != expected_rate:
+        problems.append(f"fast_classify_hit_rate reported {rates[-1]}, expected {expected_rate}")
+    
+    print(f"Prefilter answered {hits}/{len(test_cases)} cases (fast_classify_hit_rate={expected_rate})")
+    return problems
+
+
+def run_evaluation(
+    test_cases: list[dict],
+    verbose: bool = True,
+    workers: Optional[int] = None,
+    keep_raw: bool = False,
+    use_cache: bool = False,
+) -> tuple[list[TestResult], EvaluationReport]:
+    """
+    Run all test cases and generate evaluation report.
+    Cases run concurrently through workflow.ainvoke on one event loop via parallel_map, at most
+    ``workers`` in flight (each one mostly waits on the OpenAI API) within its request/token budgets;
+    results are returned in test-case order,
+    verbose lines are printed as cases finish.
+    With ``use_cache`` cases already in the persistent result cache skip the workflow; fresh
+    results are stored either way.
+    """
+    import workflow.workflow as workflow_module
+    from agents.parallel import parallel_map, estimate_tokens
+    from workflow.workflow import (
+        build_workflow, CONFIDENCE_THRESHOLD, CLASSIFICATION_MODEL, CLASSIFICATION_SYSTEM_PROMPT,
+    )
+
+    if workers is None:
+        workers = min(8, len(test_cases))
+    workers = max(1, workers)
+    
     print(f"\n{'='*70}")
     print(f"🧪 BANKING SUPPORT AGENT - EVALUATION SUITE")
     print(f"{'='*70}")
-    print(f"Running {len(test_cases)} test cases...")
+    print(f"Running {len(test_cases)} test cases ({workers} workers)...")
     print(f"Confidence threshold for escalation: {CONFIDENCE_THRESHOLD}")
+    
+    # Every setting that can change a classification or route is part of the cache key, so e.g. a
+    # --strict-llm run never replays results the prefilter produced
+    draft = workflow_module.CLASSIFICATION_RESPONSE_DRAFT
+    semantic_cache = workflow_module.CLASSIFICATION_SEMANTIC_CACHE_ENABLED
+    cache = WorkflowResultCache(WORKFLOW_CACHE_PATH, {
+        "model": CLASSIFICATION_MODEL,
+        "prompt": workflow_module.CLASSIFICATION_DRAFT_SYSTEM_PROMPT if draft else CLASSIFICATION_SYSTEM_PROMPT,
+        "prefilter": workflow_module.CLASSIFICATION_PREFILTER_ENABLED,
+        "fast_path": workflow_module.CLASSIFICATION_FAST_PATH,
+        "response_draft": draft,
+        "semantic_cache": workflow_module.CLASSIFICATION_SIMILARITY_THRESHOLD if semantic_cache else None,
+        "confidence_threshold": CONFIDENCE_THRESHOLD,
+    })
+    cached = [
+        cache.get(test_case["input"], TEST_CUSTOMER_ID) if use_cache else None
+        for test_case in test_cases
+    ]
+    hits = sum(entry is not None for entry in cached)
+    print(f"Cached workflow results: {hits}/{len(test_cases)}" + ("" if use_cache else " (cache disabled)"))
     print(f"{'='*70}\n")
     
     workflow = build_workflow()
-    results: list[TestResult] = []
-    report = EvaluationReport()
-    
-    for i, test_case in enumerate(test_cases, 1):
-        if verbose:
-            print(f"[{i}/{len(test_cases)}] {test_case['id']}: ", end="", flush=True)
-        
-        result = run_single_test(workflow, test_case)
-        results.append(result)
-        
-        # Update report
-        report.total_tests += 1
-        report.classification_total += 1
-        report.handler_total += 1
-        
-        if result.error:
-            report.error_tests += 1
-            if verbose:
-                print(f"❌ ERROR: {result.error[:50]}")
-        elif result.passed:
-            report.passed_tests += 1
-            if verbose:
-                print(f"✅ PASS ({result.actual_classification}, {result.actual_confidence:.2f})")
-        else:
-            report.failed_tests += 1
-            report.failed_cases.append(result)
-            if verbose:
-                issues = []
-                if not result.classification_correct:
-                    issues.append(f"class: {result.actual_classification}")
-                if not result.handler_correct:
-                    issues.append(f"handler: {result.actual_handler}")
-                if not result.escalation_correct:
-                    issues.append(f"escalation: {result.was_escalated}")
-                print(f"❌ FAIL ({', '.join(issues)})")
-        
-        if result.classification_correct:
-            report.classification_correct += 1
-        if result.handler_correct:
-            report.handler_correct += 1
-        
-        # Escalation tracking
-        if result.expect_escalation or result.was_escalated:
-            report.escalation_total += 1
-            if result.escalation_correct:
-                report.escalation_correct += 1
-        
-        # Confidence tracking
-        if result.expected_confidence_min is not None or result.expected_confidence_max is not None:
-            report.confidence_total += 1
-            if result.confidence_in_range:
-                report.confidence_in_range += 1
-        
-        # Processing time
-        if result.processing_time_ms > 0:
-            report.processing_times_ms.append(result.processing_time_ms)
-        
-        # By classification
-        report.by_classification[result.expected_classification]["total"] += 1
-        if result.classification_correct:
-            report.by_classification[result.expected_classification]["correct"] += 1
-        
-        # By tag
-        for tag in result.tags:
-            report.by_tag[tag]["total"] += 1
-            if result.passed:
-                report.by_tag[tag]["passed"] += 1
+    results: list[Optional[TestResult]] = [None] * len(test_cases)
+    report = EvaluationReport(keep_raw=keep_raw)
+    total = len(test_cases)
+    
+    done = 0
+    
+    def finish(i: int, result: TestResult) -> None:
+        nonlocal done
+        done += 1
+        results[i] = result
+        if cached[i] is None and result.error is None:
+            cache.put(result.input_text, TEST_CUSTOMER_ID, {
+                "classified_type": result.actual_classification,
+                "agent_name": result.actual_handler,
+                "classification_confidence": result.actual_confidence,
+                "processing_time_ms": result.processing_time_ms,
+            })
+        # Results are recorded on the event loop, so no locking is needed
+        label = f"[{done}/{total}] {result.test_id}: " if verbose else ""
+        record_result(report, result, verbose, label=label, index=i)
+        if not verbose and (done % PROGRESS_EVERY == 0 or done == total):
+            sys.stderr.write(f"\r[{done}/{total}] pass rate {report.passed_tests / done * 100:.1f}%")
+    
+    async def run_case(i: int) -> None:
+        finish(i, await run_single_test_async(workflow, test_cases[i]))
+    
+    async def run_all():
+        for i, test_case in enumerate(test_cases):
+            if cached[i] is not None:
+                finish(i, evaluate_test(test_case, cached[i], from_cache=True))
+        # Uncached cases are dispatched in test-case order, at most ``workers`` in flight
+        uncached = [i for i in range(total) if cached[i] is None]
+        await parallel_map(
+            run_case, uncached, concurrency=workers,
+            token_cost=lambda i: estimate_tokens(_workflow_input(test_cases[i])),
+        )
+    
+    asyncio.run(run_all())
+    if not verbose:
+        sys.stderr.write("\n")
+    cache.close()
+    
+    summarize_flags(report, results)
+    
+    # Report failed cases in test-case order regardless of completion order
+    report.failed_cases = [result for _, result in sorted(report.failed_cases, key=lambda entry: entry[0], reverse=True)]
     
     return results, report
 
 
 def print_report(report: EvaluationReport) -> str:
     """Generate and print the evaluation report."""
-    lines = []
+    buf = io.StringIO()
+    w = buf.write
     
-    lines.append(f"\n{'='*70}")
-    lines.append(f"📊 EVALUATION REPORT")
-    lines.append(f"{'='*70}\n")
+    w(f"\n{'='*70}\n")
+    w(f"📊 EVALUATION REPORT\n")
+    w(f"{'='*70}\n\n")
     
     # Overall metrics
-    lines.append(f"## Overall Results")
-    lines.append(f"- Total tests: {report.total_tests}")
-    lines.append(f"- Passed: {report.passed_tests} ({report.pass_rate*100:.1f}%)")
-    lines.append(f"- Failed: {report.failed_tests}")
-    lines.append(f"- Errors: {report.error_tests}")
-    lines.append("")
+    w(f"## Overall Results\n")
+    w(f"- Total tests: {report.total_tests}\n")
+    w(f"- Passed: {report.passed_tests} ({report.pass_rate*100:.1f}%)\n")
+    w(f"- Failed: {report.failed_tests}\n")
+    w(f"- Errors: {report.error_tests}\n")
+    w("\n")
     
     # Accuracy metrics
-    lines.append(f"## Accuracy Metrics")
-    lines.append(f"- Classification accuracy: {report.classification_accuracy*100:.1f}% ({report.classification_correct}/{report.classification_total})")
-    lines.append(f"- Handler routing accuracy: {report.handler_accuracy*100:.1f}% ({report.handler_correct}/{report.handler_total})")
+    w(f"## Accuracy Metrics\n")
+    w(f"- Classification accuracy: {report.classification_accuracy*100:.1f}% ({report.classification_correct}/{report.classification_total})\n")
+    w(f"- Handler routing accuracy: {report.handler_accuracy*100:.1f}% ({report.handler_correct}/{report.handler_total})\n")
     if report.escalation_total > 0:
-        lines.append(f"- Escalation accuracy: {report.escalation_accuracy*100:.1f}% ({report.escalation_correct}/{report.escalation_total})")
+        w(f"- Escalation accuracy: {report.escalation_accuracy*100:.1f}% ({report.escalation_correct}/{report.escalation_total})\n")
     if report.confidence_total > 0:
-        lines.append(f"- Confidence calibration: {report.confidence_accuracy*100:.1f}% ({report.confidence_in_range}/{report.confidence_total})")
-    lines.append("")
-    
-    # Performance metrics
-    if report.processing_times_ms:
-        lines.append(f"## Performance")
-        lines.append(f"- Avg processing time: {report.avg_processing_time_ms:.0f} ms")
-        lines.append(f"- P50 processing time: {report.p50_processing_time_ms:.0f} ms")
-        lines.append(f"- P95 processing time: {report.p95_processing_time_ms:.0f} ms")
-        lines.append("")
+        w(f"- Confidence calibration: {report.confidence_accuracy*100:.1f}% ({report.confidence_in_range}/{report.confidence_total})\n")
+    w("\n")
+    
+    # Performance metrics (fresh runs only)
+    if report.processing_time_count or report.cached_tests:
+        w(f"## Performance\n")
+        if report.processing_time_count:
+            w(f"- Avg processing time: {report.avg_processing_time_ms:.0f} ms\n")
+            w(f"- P50 processing time: {report.p50_processing_time_ms:.0f} ms\n")
+            w(f"- P95 processing time: {report.p95_processing_time_ms:.0f} ms\n")
+            w(f"- Timed runs: {report.processing_time_count}\n")
+        if report.cached_tests:
+            w(f"- Cached results (not timed, rerun without --cache to measure): {report.cached_tests}\n")
+        w("\n")
     
     # By classification breakdown
-    lines.append(f"## Accuracy by Classification Type")
-    for cls_type, stats in sorted(report.by_classification.items()):
-        acc = stats["correct"] / stats["total"] * 100 if stats["total"] else 0
-        lines.append(f"- {cls_type}: {acc:.1f}% ({stats['correct']}/{stats['total']})")
-    lines.append("")
+    w(f"## Accuracy by Classification Type\n")
+    for cls_type, total in sorted(report.by_classification_total.items()):
+        correct = report.by_classification_correct[cls_type]
+        acc = correct / total * 100 if total else 0
+        w(f"- {cls_type}: {acc:.1f}% ({correct}/{total})\n")
+    w("\n")
     
     # By tag breakdown (top tags)
-    if report.by_tag:
-        lines.append(f"## Pass Rate by Tag (top 10)")
-        sorted_tags = sorted(report.by_tag.items(), key=lambda x: x[1]["total"], reverse=True)[:10]
-        for tag, stats in sorted_tags:
-            rate = stats["passed"] / stats["total"] * 100 if stats["total"] else 0
-            lines.append(f"- {tag}: {rate:.1f}% ({stats['passed']}/{stats['total']})")
-        lines.append("")
+    if report.by_tag_total:
+        w(f"## Pass Rate by Tag (top 10)\n")
+        for tag, total in report.by_tag_total.most_common(10):
+            passed = report.by_tag_passed[tag]
+            rate = passed / total * 100 if total else 0
+            w(f"- {tag}: {rate:.1f}% ({passed}/{total})\n")
+        w("\n")
     
     # Failed cases summary
     if report.failed_cases:
-        lines.append(f"## Failed Cases ({len(report.failed_cases)})")
+        w(f"## Failed Cases ({report.failed_tests})\n")
         for result in report.failed_cases[:10]:  # Show first 10
-            lines.append(f"\n### {result.test_id}")
-            lines.append(f"- Input: \"{result.input_text[:60]}...\"" if len(result.input_text) > 60 else f"- Input: \"{result.input_text}\"")
-            lines.append(f"- Expected: {result.expected_classification} → {result.expected_handler}")
-            lines.append(f"- Actual: {result.actual_classification} → {result.actual_handler} (conf: {result.actual_confidence:.2f})")
+            w(f"\n### {result.test_id}\n")
+            inp = result.input_text
+            if len(inp) > 60:
+                inp = inp[:60] + "..."
+            w(f"- Input: \"{inp}\"\n")
+            w(f"- Expected: {result.expected_classification} → {result.expected_handler}\n")
+            w(f"- Actual: {result.actual_classification} → {result.actual_handler} (conf: {result.actual_confidence:.2f})\n")
             if result.expect_escalation:
-                lines.append(f"- Expected escalation: {result.expect_escalation}, Got: {result.was_escalated}")
-        if len(report.failed_cases) > 10:
-            lines.append(f"\n... and {len(report.failed_cases) - 10} more failed cases")
-        lines.append("")
+                w(f"- Expected escalation: {result.expect_escalation}, Got: {result.was_escalated}\n")
+        if report.failed_tests > 10:
+            w(f"\n... and {report.failed_tests - 10} more failed cases\n")
+        w("\n")
     
-    lines.append(f"{'='*70}")
+    w(f"{'='*70}")
     
-    report_text = "\n".join(lines)
+    report_text = buf.getvalue()
     print(report_text)
     return report_text
 
@@ -365,8 +741,16 @@ def main():
     parser.add_argument("--tag", type=str, help="Filter tests by tag (e.g., 'positive', 'edge_case')")
     parser.add_argument("--quick", action="store_true", help="Run only first 10 tests")
     parser.add_argument("--report", type=str, help="Save report to file (e.g., report.md)")
-    parser.add_argument("--quiet", action="store_true", help="Suppress per-test output")
+    parser.add_argument("--quiet", action="store_true", help="Suppress per-test output (show a progress line instead)")
     parser.add_argument("--test-file", type=str, default="tests/test_cases.json", help="Path to test cases JSON")
+    parser.add_argument("--semantic-cache", action="store_true", help="Reuse classifications of near-duplicate inputs (embedding similarity)")
+    parser.add_argument("--keep-raw", action="store_true", help="Keep raw processing times for exact percentiles")
+    parser.add_argument("--classifier-model", type=str, help="Classify with this model instead of CLASSIFIER_MODEL (e.g. gpt-4o)")
+    parser.add_argument("--prefilter", action="store_true", help="Classify short one-sided messages by keyword (enable the keyword prefilter)")
+    parser.add_argument("--strict-llm", action="store_true", help="Classify every input with the LLM (disable the keyword prefilter)")
+    parser.add_argument("--prefilter-check", action="store_true", help="Check the keyword prefilter against the test cases offline and exit")
+    parser.add_argument("--cache", action="store_true", help="Reuse stored workflow results of unchanged cases instead of re-running them")
+    parser.add_argument("--workers", type=int, default=None, help="Test cases in flight at once (default: min(8, number of tests))")
     args = parser.parse_args()
     
     test_file = PROJECT_ROOT / args.test_file
@@ -376,6 +760,20 @@ def main():
     
     test_cases = load_test_cases(test_file, tag_filter=args.tag)
     
+    if args.prefilter and args.strict_llm:
+        parser.error("--prefilter and --strict-llm are mutually exclusive")
+    
+    if args.semantic_cache or args.prefilter or args.strict_llm or args.classifier_model:
+        import workflow.workflow as workflow_module
+        if args.classifier_model:
+            workflow_module.CLASSIFICATION_MODEL = args.classifier_model
+        if args.semantic_cache:
+            workflow_module.CLASSIFICATION_SEMANTIC_CACHE_ENABLED = True
+        if args.prefilter:
+            workflow_module.CLASSIFICATION_PREFILTER_ENABLED = True
+        if args.strict_llm:
+            workflow_module.CLASSIFICATION_PREFILTER_ENABLED = False
+    
     if args.quick:
         test_cases = test_cases[:10]
     
@@ -383,7 +781,19 @@ def main():
         print("❌ No test cases found matching criteria")
         sys.exit(1)
     
-    results, report = run_evaluation(test_cases, verbose=not args.quiet)
+    if args.prefilter_check:
+        problems = check_prefilter(test_cases)
+        for problem in problems:
+            print(f"❌ {problem}")
+        if problems:
+            sys.exit(1)
+        print("✅ Prefilter rules agree with the test cases")
+        sys.exit(0)
+    
+    results, report = run_evaluation(
+        test_cases, verbose=not args.quiet, workers=args.workers, keep_raw=args.keep_raw,
+        use_cache=args.cache,
+    )
     report_text = print_report(report)
     
     if args.report:
@@ -0,0 +1,66 @@
+"""
+Bulk message classification through the OpenAI Batch API.
+For regression runs and historical re-classification jobs: batched requests cost 50% less and use
+a separate rate-limit pool, but results arrive within the completion window (up to 24 h) - never
+use this for interactive traffic.
+"""
+
+import logging
+from typing import Optional
+
+from pydantic import ValidationError
+
+from agents.batch import build_chat_request, read_batch_results, submit_batch, wait_for_batch
+from agents.handlers import client
+from workflow.workflow import classification_request, parse_classification
+
+log = logging.getLogger(__name__)
+
+
+def submit_classification_batch(messages: list) -> str:
+    """
+    Start a batch classifying each message with the same request as the live classifier.
+
+    :param messages: Dicts with "custom_id" (unique within the batch) and "user_input"
+    :return: Batch ID
+    """
+    requests = [
+        build_chat_request(message["custom_id"], classification_request(message["user_input"]))
+        for message in messages
+    ]
+    return submit_batch(client, requests)
+
+
+def collect_classifications(batch_id: str, poll_interval: int = 60, timeout: Optional[float] = None) -> dict:
+    """
+    Wait for a classification batch and parse its results.
+    Requests that errored or returned an invalid classification are left out.
+
+    :param batch_id: Batch ID from submit_classification_batch
+    :param poll_interval: Seconds between batch status checks
+    :param timeout: Give up after this many seconds (None waits for the whole completion window)
+    :return: Dictionary of custom_id to (classified_type, confidence, extracted_topic)
+    """
+    batch = wait_for_batch(client, batch_id, poll_interval=poll_interval, timeout=timeout)
+    classifications = {}
+    for custom_id, content in read_batch_results(client, batch).items():
+        try:
+            classifications[custom_id] = parse_classification(content)
+        except ValidationError as e:
+            log.warning("[batch_classify] Invalid classification for %s: %s", custom_id, e)
+    return classifications
+
+
+def classify_batch(messages: list, poll_interval: int = 60, timeout: Optional[float] = None) -> dict:
+    """
+    Classify many messages through one batch, blocking until it finishes.
+
+    :param messages: Dicts with "custom_id" (unique within the batch) and "user_input"
+    :param poll_interval: Seconds between batch status checks
+    :param timeout: Give up after this many seconds (None waits for the whole completion window)
+    :return: Dictionary of custom_id to (classified_type, confidence, extracted_topic)
+    """
+    if not messages:
+        return {}
+    batch_id = submit_classification_batch(messages)
+    return collect_classifications(batch_id, poll_interval=poll_interval, timeout=timeout)
@@ -1,28 +1,122 @@
-from typing import TypedDict, Literal
+from collections import Counter, OrderedDict
+from functools import lru_cache
+from typing import TypedDict, Literal, Optional
 from pydantic import BaseModel, Field
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph, START, END
-from openai import OpenAI
+from cachetools import LRUCache
 from dotenv import load_dotenv
+import asyncio
+import logging
+import math
 import os
-import sys
+import re
+import threading
 import time
-from pathlib import Path
 
-# Add parent directory to Python path so we can import agents module
-sys.path.insert(0, str(Path(__file__).parent.parent))
-
-# Import our specialized agents
-from agents.handlers import NegativeFeedbackAgent, PositiveFeedbackAgent, QueryAgent, ResponseAgent, EscalationAgent
-from db.db_utils import LogManager, SessionManager
+# Import our specialized agents (run as a module from the project root: python -m workflow.workflow)
+from agents.handlers import (
+    NegativeFeedbackAgent, PositiveFeedbackAgent, QueryAgent, ResponseAgent, EscalationAgent,
+    FALLBACK_FEEDBACK, FALLBACK_REQUEST, EMBEDDING_MODEL,
+    client, async_client,
+)
+from agents._cache import SemanticCache
+from agents.parallel import parallel_map
+from db.db_utils import LogManager
 
 # Load environment variables
 load_dotenv()
 
-client = OpenAI(api_key=os.getenv("PAID_OPENAI_API_KEY"))
+log = logging.getLogger(__name__)
+
+# One key=value line per handled message (type, confidence, classification source, agent, latency);
+# route this logger to a metrics sink to collect them (e.g. prefilter hit rate = source=prefilter share)
+metrics_log = logging.getLogger("workflow.metrics")
+
+# Classification shares the agents' pooled (HTTP/2 when h2 is installed) OpenAI clients - sync for
+# invoke(), async for ainvoke() - so classify and respond calls reuse the same keep-alive
+# connections to api.openai.com. They live for the whole process - never close() them mid-run.
+
+# Model used for message classification (a three-way label does not need gpt-4o). Set
+# CLASSIFIER_MODEL=gpt-4o to roll back without a code change.
+CLASSIFICATION_MODEL = os.getenv("CLASSIFIER_MODEL", "gpt-4o-mini")
+
+# Single-token fast path: logit_bias restricts the reply to one of three label tokens and the
+# label's probability becomes the confidence. It yields no topic (the message prefix is used), so
+# it is opt-in; without tiktoken the structured classifier is used instead.
+CLASSIFICATION_FAST_PATH = os.getenv("CLASSIFICATION_FAST_PATH", "false").lower() in ("1", "true", "yes")
+FAST_PATH_LABELS = {"positive": "positive_feedback", "negative": "negative_feedback", "query": "query"}
+
+# One-call positive feedback: the structured classifier also drafts the thank-you reply, and
+# confident positive feedback goes straight to format_response without PositiveFeedbackAgent's
+# LLM call. Complaints still need the handler (their reply cites the ticket it creates). Opt-in:
+# the draft is generic (the classifier never sees the customer's name) and costs output tokens.
+CLASSIFICATION_RESPONSE_DRAFT = os.getenv("CLASSIFICATION_RESPONSE_DRAFT", "false").lower() in ("1", "true", "yes")
+
+# Streamed classification: classified_type is the first field of the structured reply, so once it
+# reads "query" QueryAgent's ticket lookup is started while the rest of the reply is generated,
+# and query_handler picks up the result instead of querying the database after routing. Opt-in: the
+# lookup future travels in graph state, which a LangGraph checkpointer cannot serialize
+CLASSIFICATION_PREFETCH = os.getenv("CLASSIFICATION_PREFETCH", "false").lower() in ("1", "true", "yes")
+_STREAMED_TYPE_RE = re.compile(r'"classified_type"\s*:\s*"(\w+)"')
 
 # Route to escalation when classification confidence is below this (PRD: "uncertain")
 CONFIDENCE_THRESHOLD = 0.75
 
+# Response cache for repeated inputs ("thanks!", "love the new app"): a hit skips classification
+# and the agents. Complaints are never cached since each one must create its own ticket, and
+# queries aren't either: their answers quote ticket status, which can change at any moment
+# (update_ticket_status / add_agent_response, possibly from another process).
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "1800"))
+RESPONSE_CACHE_MAXSIZE = 4096
+CACHEABLE_TYPES = {"positive_feedback"}
+CACHED_FIELDS = (
+    "classified_type", "classification_confidence", "extracted_topic",
+    "ticket_id", "ticket_status", "response", "agent_name",
+)
+_PUNCTUATION_RE = re.compile(r"[^\w\s]")
+_WHITESPACE_RE = re.compile(r"\s+")
+# (customer_id, normalized input) -> (expires_at, cached fields); oldest entries evicted first
+_response_cache = OrderedDict()
+_response_cache_lock = threading.Lock()
+
+# Semantic classification cache: paraphrases of an earlier message ("I love your app" /
+# "I really love your banking app") reuse its classification instead of calling the LLM
+CLASSIFICATION_SEMANTIC_CACHE_ENABLED = os.getenv("CLASSIFICATION_SEMANTIC_CACHE", "false").lower() in ("1", "true", "yes")
+CLASSIFICATION_SIMILARITY_THRESHOLD = float(os.getenv("CLASSIFICATION_SIMILARITY_THRESHOLD", "0.95"))
+# Stored classifications expire after a day so prompt or model changes are picked up
+CLASSIFICATION_SEMANTIC_CACHE_TTL_SECONDS = int(os.getenv("CLASSIFICATION_SEMANTIC_CACHE_TTL_SECONDS", "86400"))
+classification_cache = SemanticCache(
+    threshold=CLASSIFICATION_SIMILARITY_THRESHOLD,
+    ttl_seconds=CLASSIFICATION_SEMANTIC_CACHE_TTL_SECONDS,
+    max_entries=10000,
+)
+
+# Exact-input classification memo shared by the sync and async paths: at temperature 0 a repeat
+# would get the same answer. Failures raise, so they are never stored.
+_classification_memo = LRUCache(maxsize=4096)
+_classification_memo_lock = threading.Lock()
+
+# Keyword prefilter: short, unambiguous praise, complaints or ticket lookups ("thank you so much!",
+# "this is terrible", "status of ticket #501197") are classified without the LLM. Other questions
+# and mixed messages still go to the LLM, and so does any feedback with a negator or a contrast /
+# sarcasm marker ("not happy", "thanks for nothing", "I love how you lost my card"), since keywords
+# alone would read those as the opposite sentiment. Opt-in: a wrong prefilter answer is confident.
+CLASSIFICATION_PREFILTER_ENABLED = os.getenv("CLASSIFICATION_PREFILTER", "false").lower() in ("1", "true", "yes")
+PREFILTER_MAX_LENGTH = 80
+PREFILTER_CONFIDENCE = 0.9
+PREFILTER_MIN_QUERY_WORDS = 4
+_POSITIVE_RE = re.compile(r"\b(thank|thanks|love|great|awesome|happy|amazing)\b", re.IGNORECASE)
+_NEGATIVE_RE = re.compile(r"\b(terrible|awful|horrible|worst|useless|unacceptable|ridiculous|disappointed|angry|frustrated|upset|hate)\b", re.IGNORECASE)
+_QUERY_RE = re.compile(r"#\d{6}\b|\bticket\s+\d{6}\b|\bstatus of\b", re.IGNORECASE)
+# Classifications per source since start-up; emit_metrics reports the prefilter's share as
+# fast_classify_hit_rate, the drift signal for the keyword rules
+_classification_sources = Counter()
+_classification_sources_lock = threading.Lock()
+_NEGATION_RE = re.compile(r"\b(not|never|no|nothing|nobody|hardly|without)\b|n't\b|n’t\b", re.IGNORECASE)
+_CONTRAST_RE = re.compile(r"\b(but|however|though|although|yet|except|for nothing|how you|supposed to|i guess)\b", re.IGNORECASE)
+
 class MessageClassification(BaseModel):
     """
     Docstring for MessageClassification
@@ -44,6 +138,54 @@ class MessageClassification(BaseModel):
     )
 
 
+class DraftedMessageClassification(MessageClassification):
+    """
+    MessageClassification plus a reply drafted in the same call (CLASSIFICATION_RESPONSE_DRAFT)
+    """
+    response_draft: Optional[str] = Field(
+        ...,
+        description="Thank-you reply to the customer for positive_feedback, otherwise null"
+    )
+
+
+def _strict_schema(node):
+    """
+    Make a pydantic JSON schema valid for OpenAI strict structured outputs: every object lists all
+    its properties as required and forbids extra ones, and ``default: null`` is dropped (Optional
+    fields stay nullable through their ``anyOf``). Local so we don't depend on openai's private
+    ``openai.lib._pydantic`` helpers.
+
+    :param node: Schema (or sub-schema) from ``model_json_schema()``
+    :return: Strict copy of the schema
+    """
+    if isinstance(node, list):
+        return [_strict_schema(item) for item in node]
+    if not isinstance(node, dict):
+        return node
+    strict = {key: _strict_schema(value) for key, value in node.items() if not (key == "default" and value is None)}
+    if strict.get("type") == "object" and "properties" in strict:
+        strict["additionalProperties"] = False
+        strict["required"] = list(strict["properties"])
+    return strict
+
+
+def _response_format(model: type[BaseModel]) -> dict:
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": model.__name__,
+            "schema": _strict_schema(model.model_json_schema()),
+            "strict": True,
+        },
+    }
+
+
+# Strict structured-output formats, built once at import instead of being re-derived from the
+# model on every beta.chat.completions.parse() call
+CLASSIFICATION_RESPONSE_FORMAT = _response_format(MessageClassification)
+CLASSIFICATION_DRAFT_RESPONSE_FORMAT = _response_format(DraftedMessageClassification)
+
+
 class _BankingAgentStateRequired(TypedDict):
     # Input
     user_input: str
@@ -69,6 +211,11 @@ class _BankingAgentStateOptional(TypedDict, total=False):
     conversation_history: list  # Optional: list of {"role": "user"|"assistant", "content": str} for LLM context
     processing_start_time: float  # Internal: set by validate_input for timing
     processing_time_ms: int  # Computed in log_interaction from start time
+    cache_hit: bool  # Internal: set by check_response_cache when a cached response was reused
+    classification_source: str  # Internal: "prefilter", "llm" (incl. its caches) or "fallback"; for metrics
+    response_draft: str  # Internal: positive-feedback reply drafted by the classifier (CLASSIFICATION_RESPONSE_DRAFT)
+    query_lookup: object  # Internal: QueryAgent.prefetch_lookup future started during classification (CLASSIFICATION_PREFETCH)
+    log_synchronously: bool  # Optional: write the log before the run returns (callers that re-read it right away)
 
 
 class BankingAgentState(_BankingAgentStateRequired, _BankingAgentStateOptional):
@@ -77,8 +224,6 @@ class BankingAgentState(_BankingAgentStateRequired, _BankingAgentStateOptional):
 
 def validate_input(state):
     """Validate user input and capture processing start time."""
-    print("📥 [validate_input] Running validation...")
-
     start_time = time.perf_counter()
 
     user_input = state.get("user_input", "").strip()
@@ -92,9 +237,8 @@ def validate_input(state):
     if not customer_name:
         raise ValueError("Customer name cannot be empty.")
 
-    print(f"✅ [validate_input] Validation passed!")
-    print(f"   - Customer: {customer_name} ({customer_id})")
-    print(f"   - Message: {user_input[:50]}...")
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug("[validate_input] Customer %s (%s), message: %s...", customer_name, customer_id, user_input[:50])
 
     return {
         "user_input": user_input,
@@ -103,107 +247,480 @@ def validate_input(state):
         "processing_start_time": start_time
     }
 
-def classify_message(state: BankingAgentState) -> dict:
+def _response_cache_key(state) -> tuple:
+    """Cache key: customer_id plus the input lowercased, without punctuation, whitespace squashed."""
+    text = _PUNCTUATION_RE.sub(" ", state["user_input"].lower())
+    return state["customer_id"], _WHITESPACE_RE.sub(" ", text).strip()
+
+
+def check_response_cache(state: BankingAgentState) -> dict:
+    """Reuse the response to an identical recent input from the same customer, if cached."""
+    if not RESPONSE_CACHE_ENABLED:
+        return {"cache_hit": False}
+    key = _response_cache_key(state)
+    with _response_cache_lock:
+        entry = _response_cache.get(key)
+        if entry is None:
+            return {"cache_hit": False}
+        expires_at, cached = entry
+        if expires_at <= time.time():
+            del _response_cache[key]
+            return {"cache_hit": False}
+        _response_cache.move_to_end(key)
+    log.debug("[check_response_cache] Cache hit, skipping classification and agents")
+    return {**cached, "cache_hit": True}
+
+
+def _store_response(state: BankingAgentState, response: str) -> None:
+    """Cache the final response for cacheable, non-escalated, non-fallback results."""
+    if not RESPONSE_CACHE_ENABLED or state.get("classified_type") not in CACHEABLE_TYPES:
+        return
+    if state.get("agent_name") == "EscalationAgent" or response in (FALLBACK_FEEDBACK, FALLBACK_REQUEST):
+        return
+    cached = {field: state.get(field) for field in CACHED_FIELDS if state.get(field) is not None}
+    cached["response"] = response
+    key = _response_cache_key(state)
+    with _response_cache_lock:
+        _response_cache[key] = (time.time() + RESPONSE_CACHE_TTL_SECONDS, cached)
+        _response_cache.move_to_end(key)
+        while len(_response_cache) > RESPONSE_CACHE_MAXSIZE:
+            _response_cache.popitem(last=False)
+
+
+# Kept short: prompt tokens are prefill latency and input cost on every message. The label
+# definitions carry the meaning; a three-way label does not need worked examples.
+_CLASSIFICATION_LABELS = """Classify a banking customer's message as exactly one of:
+- positive_feedback: satisfaction, praise or thanks
+- negative_feedback: complaints, dissatisfaction or frustration
+- query: questions, requests, or anything not clearly positive or negative"""
+
+CLASSIFICATION_SYSTEM_PROMPT = _CLASSIFICATION_LABELS + """
+Return classified_type, confidence (0-1), reasoning (one sentence) and extracted_topic (at most 8 words)."""
+
+CLASSIFICATION_FAST_SYSTEM_PROMPT = _CLASSIFICATION_LABELS + """
+Answer with exactly one word: positive, negative or query."""
+
+CLASSIFICATION_DRAFT_SYSTEM_PROMPT = CLASSIFICATION_SYSTEM_PROMPT + """
+For positive_feedback also return response_draft: a warm 1-2 sentence thank-you that mentions what they liked, \
+without a name or greeting. Otherwise response_draft is null."""
+
+# prompt_cache_key hints that route classification calls to servers holding the cached system-prompt
+# prefix. Bump the version whenever the corresponding prompt text changes.
+CLASSIFICATION_PROMPT_CACHE_KEY = "banking_classifier_v2"
+CLASSIFICATION_FAST_PROMPT_CACHE_KEY = "banking_classifier_fast_v2"
+CLASSIFICATION_DRAFT_PROMPT_CACHE_KEY = "banking_classifier_draft_v1"
+
+# System messages are identical on every call; build them once and share them between requests
+_CLASSIFICATION_SYSTEM_MESSAGE = {"role": "system", "content": CLASSIFICATION_SYSTEM_PROMPT}
+_CLASSIFICATION_FAST_SYSTEM_MESSAGE = {"role": "system", "content": CLASSIFICATION_FAST_SYSTEM_PROMPT}
+_CLASSIFICATION_DRAFT_SYSTEM_MESSAGE = {"role": "system", "content": CLASSIFICATION_DRAFT_SYSTEM_PROMPT}
+
+
+def _classification_messages(system_message: dict, user_input: str) -> tuple:
+    # A tuple, so the shared system message is not appended to by accident
+    return system_message, {"role": "user", "content": f'Classify this customer message: "{user_input}"'}
+
+
+@lru_cache(maxsize=1)
+def _fast_path_logit_bias():
+    """logit_bias allowing only the first token of each fast-path label, or None without tiktoken."""
+    try:
+        import tiktoken
+        encoding = tiktoken.encoding_for_model(CLASSIFICATION_MODEL)
+    except Exception:  # tiktoken missing or its encoding file unavailable
+        return None
+    token_ids = {encoding.encode(label)[0] for label in FAST_PATH_LABELS}
+    if len(token_ids) != len(FAST_PATH_LABELS):
+        return None
+    return {str(token_id): 100 for token_id in token_ids}
+
+
+def _memo_get(user_input: str):
+    with _classification_memo_lock:
+        return _classification_memo.get(user_input)
+
+
+def _memo_store(user_input: str, result: tuple) -> None:
+    with _classification_memo_lock:
+        _classification_memo[user_input] = result
+
+
+def _semantic_hit(vector):
+    cached = classification_cache.lookup("classification", vector)
+    if cached is not None:
+        log.debug("[classify_message] Semantic cache hit")
+    return cached
+
+
+def _classify_cached(user_input: str, on_type=None) -> tuple[str, float, str]:
     """
-    Classify customer message using LLM with structured JSON output.
+    Classify one message; returns (classified_type, confidence, extracted_topic).
+    Memoized on the exact input. On a miss the semantic cache (if enabled) is tried before the LLM,
+    whose streamed classified_type is passed to on_type as soon as it is decoded.
+    """
+    result = _memo_get(user_input)
+    if result is not None:
+        return result
+
+    vector = None
+    if CLASSIFICATION_SEMANTIC_CACHE_ENABLED:
+        try:
+            vector = client.embeddings.create(model=EMBEDDING_MODEL, input=user_input).data[0].embedding
+        except Exception as e:
+            log.warning("[classify_message] Embedding failed, skipping semantic cache: %s", e)
+        else:
+            result = _semantic_hit(vector)
+
+    if result is None:
+        if CLASSIFICATION_FAST_PATH:
+            result = _classify_fast(user_input)
+        if result is None:
+            result = _classify_llm(user_input, on_type)
+        if vector is not None:
+            classification_cache.store("classification", vector, result)
+    _memo_store(user_input, result)
+    return result
+
+
+async def _aclassify_cached(user_input: str, on_type=None) -> tuple[str, float, str]:
+    """Async version of _classify_cached using the shared AsyncOpenAI client."""
+    result = _memo_get(user_input)
+    if result is not None:
+        return result
+
+    vector = None
+    if CLASSIFICATION_SEMANTIC_CACHE_ENABLED:
+        try:
+            embedding = await async_client.embeddings.create(model=EMBEDDING_MODEL, input=user_input)
+            vector = embedding.data[0].embedding
+        except Exception as e:
+            log.warning("[classify_message] Embedding failed, skipping semantic cache: %s", e)
+        else:
+            result = _semantic_hit(vector)
+
+    if result is None:
+        if CLASSIFICATION_FAST_PATH:
+            result = await _aclassify_fast(user_input)
+        if result is None:
+            result = await _aclassify_llm(user_input, on_type)
+        if vector is not None:
+            classification_cache.store("classification", vector, result)
+    _memo_store(user_input, result)
+    return result
+
+
+def _fast_request(user_input: str, logit_bias: dict) -> dict:
+    return dict(
+        model=CLASSIFICATION_MODEL,
+        messages=_classification_messages(_CLASSIFICATION_FAST_SYSTEM_MESSAGE, user_input),
+        max_tokens=1,
+        logit_bias=logit_bias,
+        logprobs=True,
+        temperature=0.0,
+        prompt_cache_key=CLASSIFICATION_FAST_PROMPT_CACHE_KEY,
+    )
 
-    :param state: Current workflow state containing user_input
-    :type state: BankingAgentState
-    :return: Dictionary with classification results
-    :rtype: dict
+
+def _parse_fast(response, user_input: str):
+    token = response.choices[0].logprobs.content[0]
+    label = token.token.strip().lower()
+    # Only the label tokens are allowed, so prefixes ("pos", "neg", "qu") identify the label
+    classified_type = next((t for word, t in FAST_PATH_LABELS.items() if label and word.startswith(label)), None)
+    if classified_type is None:
+        return None
+    return classified_type, math.exp(token.logprob), user_input[:50]
+
+
+def _classify_fast(user_input: str):
+    """
+    One-token classification via logit_bias; returns (classified_type, confidence, extracted_topic),
+    or None when the fast path is unavailable or the reply is not one of the labels.
     """
-    print("🔍 [classify_message] Classifying message...")
+    logit_bias = _fast_path_logit_bias()
+    if logit_bias is None:
+        return None
+    response = client.chat.completions.create(**_fast_request(user_input, logit_bias))
+    return _parse_fast(response, user_input)
 
-    user_input = state["user_input"]
 
-    system_prompt = """You are a classification expert for a banking customer support system.
-    Your task is to classify customer messages into three categories:
+async def _aclassify_fast(user_input: str):
+    """Async version of _classify_fast."""
+    logit_bias = _fast_path_logit_bias()
+    if logit_bias is None:
+        return None
+    response = await async_client.chat.completions.create(**_fast_request(user_input, logit_bias))
+    return _parse_fast(response, user_input)
+
+
+def classification_request(user_input: str, response_draft: bool = False) -> dict:
+    """
+    Chat-completions request body for the structured classification of one message;
+    with response_draft the reply to positive feedback is drafted in the same call.
+    """
+    if response_draft:
+        return dict(
+            model=CLASSIFICATION_MODEL,
+            messages=_classification_messages(_CLASSIFICATION_DRAFT_SYSTEM_MESSAGE, user_input),
+            response_format=CLASSIFICATION_DRAFT_RESPONSE_FORMAT,
+            temperature=0.0,
+            prompt_cache_key=CLASSIFICATION_DRAFT_PROMPT_CACHE_KEY,
+        )
+    return dict(
+        model=CLASSIFICATION_MODEL,
+        messages=_classification_messages(_CLASSIFICATION_SYSTEM_MESSAGE, user_input),
+        response_format=CLASSIFICATION_RESPONSE_FORMAT,
+        temperature=0.0,
+        prompt_cache_key=CLASSIFICATION_PROMPT_CACHE_KEY,
+    )
+
+
+def parse_classification(content: str) -> tuple[str, float, str]:
+    """Validate a structured classification reply; returns (classified_type, confidence, extracted_topic)."""
+    classification = MessageClassification.model_validate_json(content)
+    return classification.classified_type, classification.confidence, classification.extracted_topic
+
+
+def _parse_content(content: str) -> tuple:
+    if not CLASSIFICATION_RESPONSE_DRAFT:
+        return parse_classification(content)
+    classification = DraftedMessageClassification.model_validate_json(content)
+    result = classification.classified_type, classification.confidence, classification.extracted_topic
+    if classification.classified_type == "positive_feedback" and classification.response_draft:
+        return (*result, classification.response_draft.strip())
+    return result
+
+
+def _watch_type(parts: list, on_type):
+    """Call on_type once the streamed reply so far contains classified_type; returns the callback still pending."""
+    match = _STREAMED_TYPE_RE.search("".join(parts))
+    if match is None:
+        return on_type
+    on_type(match.group(1))
+    return None
+
+
+def _classify_llm(user_input: str, on_type=None) -> tuple:
+    """
+    Structured-output LLM classification; returns (classified_type, confidence, extracted_topic),
+    with the drafted reply appended for positive feedback when CLASSIFICATION_RESPONSE_DRAFT is on.
+    With on_type the reply is streamed and on_type(classified_type) is called as soon as it is decoded.
+    """
+    request = classification_request(user_input, CLASSIFICATION_RESPONSE_DRAFT)
+    if on_type is None:
+        return _parse_content(client.chat.completions.create(**request).choices[0].message.content)
+    parts = []
+    for chunk in client.chat.completions.create(**request, stream=True):
+        delta = chunk.choices[0].delta.content if chunk.choices else None
+        if delta:
+            parts.append(delta)
+            if on_type is not None:
+                on_type = _watch_type(parts, on_type)
+    return _parse_content("".join(parts))
+
+
+async def _aclassify_llm(user_input: str, on_type=None) -> tuple:
+    """Async version of _classify_llm."""
+    request = classification_request(user_input, CLASSIFICATION_RESPONSE_DRAFT)
+    if on_type is None:
+        return _parse_content((await async_client.chat.completions.create(**request)).choices[0].message.content)
+    parts = []
+    async for chunk in await async_client.chat.completions.create(**request, stream=True):
+        delta = chunk.choices[0].delta.content if chunk.choices else None
+        if delta:
+            parts.append(delta)
+            if on_type is not None:
+                on_type = _watch_type(parts, on_type)
+    return _parse_content("".join(parts))
+
+
+def _prefilter_classify(user_input: str):
+    """Keyword classification for short, one-sided messages; None when the LLM should decide."""
+    if not CLASSIFICATION_PREFILTER_ENABLED or len(user_input) > PREFILTER_MAX_LENGTH:
+        return None
+    positive = _POSITIVE_RE.search(user_input) is not None
+    negative = _NEGATIVE_RE.search(user_input) is not None
+    query = _QUERY_RE.search(user_input) is not None
+    if positive + negative + query != 1:
+        return None
+    # Questions are only short-circuited when they are ticket / status lookups; a bare ticket
+    # reference ("ticket 999999") is left to the LLM, which is expected to be unsure about it
+    if "?" in user_input and not query:
+        return None
+    if query and len(user_input.split()) < PREFILTER_MIN_QUERY_WORDS:
+        return None
+    # Keywords can't tell "happy" from "not happy" or sincere from sarcastic thanks
+    if not query and (_NEGATION_RE.search(user_input) or _CONTRAST_RE.search(user_input)):
+        return None
+    log.debug("[classify_message] Keyword prefilter match, skipping LLM")
+    classified_type = "query" if query else "positive_feedback" if positive else "negative_feedback"
+    return classified_type, PREFILTER_CONFIDENCE, user_input[:50]
+
+
+def record_classification_source(source: str) -> None:
+    """Count one classification answered by ``source`` ("prefilter", "llm" or "fallback")."""
+    with _classification_sources_lock:
+        _classification_sources[source] += 1
+
+
+def fast_classify_hit_rate() -> float:
+    """Share of classifications since start-up that the keyword prefilter answered without the LLM."""
+    with _classification_sources_lock:
+        total = sum(_classification_sources.values())
+        return _classification_sources["prefilter"] / total if total else 0.0
+
+
+def _classification_update(classification: tuple, source: str) -> dict:
+    classified_type, confidence, extracted_topic, *draft = classification
+    record_classification_source(source)
+    log.debug("[classify_message] type=%s confidence=%.2f topic=%s source=%s", classified_type, confidence, extracted_topic, source)
+
+    update = {
+        "classified_type": classified_type,
+        "classification_confidence": confidence,
+        "extracted_topic": extracted_topic,
+        "classification_source": source,
+    }
+    if draft:
+        update["response_draft"] = draft[0]
+    return update
+
+
+def _query_prefetcher(state: BankingAgentState, prefetched: list):
+    """on_type callback starting QueryAgent's ticket lookup (collected in prefetched) for queries."""
+    if not CLASSIFICATION_PREFETCH:
+        return None
+
+    def on_type(classified_type: str) -> None:
+        if classified_type == "query":
+            prefetched.append(QueryAgent.prefetch_lookup(state))
+
+    return on_type
+
 
-    1. **positive_feedback**: Messages that express satisfaction, praise, thanks, or positive sentiment.
-       Example: "Thank you for your help, I'm very happy with the service!"
+def _cancel_prefetch(prefetched: list) -> None:
+    # A lookup that is already running can't be cancelled; it finishes and its result is dropped
+    for lookup in prefetched:
+        lookup.cancel()
 
-    2. **negative_feedback**: Messages that express dissatisfaction, complaints, frustration, or negative sentiment.
-       Example: "I'm really upset with how my issue was handled, this is terrible service."
 
-    3. **query**: Messages that contain a question, request for information, or any message that is not clearly positive or negative feedback.
-       Example: "Can you tell me why my account was charged twice?"
+def _with_prefetch(update: dict, prefetched: list) -> dict:
+    # Only hand the lookup on when the message will actually be routed to query_handler
+    if prefetched and update["classified_type"] == "query" and update["classification_confidence"] >= CONFIDENCE_THRESHOLD:
+        update["query_lookup"] = prefetched[0]
+    else:
+        _cancel_prefetch(prefetched)
+    return update
+
+
+def _classification_failed(user_input: str, error: Exception) -> dict:
+    log.warning("[classify_message] Classification failed: %s", error)
+    record_classification_source("fallback")
+    return {
+        "classified_type": "query",
+        "classification_confidence": 0.5,
+        "extracted_topic": user_input[:50],
+        "classification_source": "fallback",
+    }
 
-    Analyze the message and provide your classification."""
 
-    user_prompt = f'Classify this customer message: "{user_input}"'
+def classify_message(state: BankingAgentState) -> dict:
+    """
+    Classify customer message using LLM with structured JSON output.
+
+    :param state: Current workflow state containing user_input
+    :type state: BankingAgentState
+    :return: Dictionary with classification results
+    :rtype: dict
+    """
+    user_input = state["user_input"]
+    prefetched = []
 
     try:
-        response = client.beta.chat.completions.parse(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            response_format=MessageClassification,
-            temperature=0.0
-        )
+        prefiltered = _prefilter_classify(user_input)
+        if prefiltered is not None:
+            return _classification_update(prefiltered, "prefilter")
+        classification = _classify_cached(user_input, _query_prefetcher(state, prefetched))
+        return _with_prefetch(_classification_update(classification, "llm"), prefetched)
+    except Exception as e:
+        _cancel_prefetch(prefetched)
+        return _classification_failed(user_input, e)
 
-        classification = response.choices[0].message.parsed
 
-        print(f"✅ [classify_message] Classification successful!")
-        print(f"   - Type: {classification.classified_type}")
-        print(f"   - Confidence: {classification.confidence:.2f}")
-        print(f"   - Topic: {classification.extracted_topic}")
+async def aclassify_message(state: BankingAgentState) -> dict:
+    """Async version of classify_message; the LLM call is awaited so concurrent runs overlap."""
+    user_input = state["user_input"]
+    prefetched = []
 
-        return {
-            "classified_type": classification.classified_type,
-            "classification_confidence": classification.confidence,
-            "extracted_topic": classification.extracted_topic
-        }
+    try:
+        prefiltered = _prefilter_classify(user_input)
+        if prefiltered is not None:
+            return _classification_update(prefiltered, "prefilter")
+        classification = await _aclassify_cached(user_input, _query_prefetcher(state, prefetched))
+        return _with_prefetch(_classification_update(classification, "llm"), prefetched)
     except Exception as e:
-        print(f"❌ [classify_message] Classification failed: {str(e)}")
-        return {
-            "classified_type": "query",
-            "classification_confidence": 0.5,
-            "extracted_topic": user_input[:50]
-        }
+        _cancel_prefetch(prefetched)
+        return _classification_failed(user_input, e)
 
 # ============================================================================
 # ROUTING FUNCTIONS
 # ============================================================================
 
+# Content handler node for each classification type
+_ROUTE_TABLE = {
+    "positive_feedback": "positive_feedback_handler",
+    "negative_feedback": "negative_feedback_handler",
+    "query": "query_handler",
+}
+
+
 def route_by_classification(state: BankingAgentState) -> str:
     """
     Router that picks the content handler by classification type only.
     """
     classified_type = state["classified_type"]
-    if classified_type == "positive_feedback":
-        return "positive_feedback_handler"
-    elif classified_type == "negative_feedback":
-        return "negative_feedback_handler"
-    elif classified_type == "query":
-        return "query_handler"
-    else:
-        raise ValueError(f"Invalid classification type: {classified_type}")
+    try:
+        return _ROUTE_TABLE[classified_type]
+    except KeyError:
+        raise ValueError(f"Invalid classification type: {classified_type}") from None
+
+
+def route_after_cache(state: BankingAgentState) -> str:
+    """
+    Router from check_response_cache: cache hit → straight to logging + metrics, else → classification.
+    """
+    return ["log_interaction", "emit_metrics"] if state.get("cache_hit") else "classify_message"
 
 
 def route_after_classification(state: BankingAgentState) -> str:
     """
-    Router from classify_message: low confidence → escalation, else → content handler.
+    Router from classify_message: low confidence → escalation, drafted reply → format_response,
+    else → content handler.
     """
     confidence = state.get("classification_confidence", 0.0)
-    classified_type = state["classified_type"]
-
     if confidence < CONFIDENCE_THRESHOLD:
-        print(f"🔀 [router] Low confidence ({confidence:.2f}) → escalation_handler")
+        log.debug("[router] Low confidence (%.2f) -> escalation_handler", confidence)
         return "escalation_handler"
-    print(f"🔀 [router] Routing to: {classified_type}_handler")
-    return route_by_classification(state)
+    if state.get("response_draft"):
+        log.debug("[router] Using the classifier's drafted reply -> use_response_draft")
+        return "use_response_draft"
+    route = route_by_classification(state)
+    log.debug("[router] Routing to: %s", route)
+    return route
 
 # ============================================================================
 # HANDLER NODES (delegate to specialized agents)
 # ============================================================================
 
+# Each node has an async twin used by workflow.ainvoke(); invoke() keeps using the sync one.
+
 def positive_feedback_handler(state: BankingAgentState) -> dict:
     """
     Handler node for positive feedback - delegates to PositiveFeedbackAgent.
     """
     return PositiveFeedbackAgent.handle(state)
+
+async def apositive_feedback_handler(state: BankingAgentState) -> dict:
+    return await PositiveFeedbackAgent.ahandle(state)
     
 def negative_feedback_handler(state: BankingAgentState) -> dict:
     """
@@ -211,23 +728,47 @@ def negative_feedback_handler(state: BankingAgentState) -> dict:
     """
     return NegativeFeedbackAgent.handle(state)
 
+async def anegative_feedback_handler(state: BankingAgentState) -> dict:
+    return await NegativeFeedbackAgent.ahandle(state)
+
 def query_handler(state: BankingAgentState) -> dict:
     """
-    Handler node for queries - delegates to QueryAgent.
+    Handler node for queries - delegates to QueryAgent, reusing a ticket lookup prefetched during classification.
     """
-    return QueryAgent.handle(state)
+    return {**QueryAgent.handle(state, state.get("query_lookup")), "query_lookup": None}
+
+async def aquery_handler(state: BankingAgentState) -> dict:
+    return {**await QueryAgent.ahandle(state, state.get("query_lookup")), "query_lookup": None}
+
+def use_response_draft(state: BankingAgentState) -> dict:
+    """
+    Stand-in for positive_feedback_handler when the classifier already drafted the reply:
+    greet the customer by name and hand the draft to format_response, with no extra LLM call.
+    """
+    return {
+        "response": f"Hi {state['customer_name']}! {state['response_draft']}",
+        "agent_name": "PositiveFeedbackAgent",
+    }
 
 def format_response(state: BankingAgentState) -> dict:
     """
-    Format the response for the user.
+    Format the response for the user and cache it for repeats of the same input.
     """
-    return ResponseAgent.handle(state)
+    result = ResponseAgent.handle(state)
+    _store_response(state, result["response"])
+    return result
+
+async def aformat_response(state: BankingAgentState) -> dict:
+    result = await ResponseAgent.ahandle(state)
+    _store_response(state, result["response"])
+    return result
 
 def log_interaction(state: BankingAgentState) -> dict:
     """
-    Log the interaction to the database. Extracts fields from state for LogManager.
+    Queue the interaction for a batched background write, or write it now when the state sets
+    log_synchronously. Extracts fields from state for LogManager.
     Computes processing_time_ms from processing_start_time if available.
-    If session_id is present, appends the new log to that session via SessionManager.
+    If session_id is present, the new log is also appended to that session.
     """
     start_time = state.get("processing_start_time")
     if start_time:
@@ -235,7 +776,7 @@ def log_interaction(state: BankingAgentState) -> dict:
     else:
         processing_time_ms = state.get("processing_time_ms", 0)
 
-    log_id = LogManager.log_interaction(
+    log_fields = dict(
         customer_id=state.get("customer_id", ""),
         input_message=state.get("user_input", ""),
         classification=state.get("classified_type", ""),
@@ -247,21 +788,57 @@ def log_interaction(state: BankingAgentState) -> dict:
         processing_time_ms=processing_time_ms,
         errors=None,
     )
-    session_id = state.get("session_id")
-    if session_id and state.get("customer_id"):
-        SessionManager.add_interaction_to_session(
-            session_id, state["customer_id"], log_id
-        )
+    session_id = state.get("session_id") if state.get("customer_id") else None
+    if state.get("log_synchronously"):
+        LogManager.log_interaction(**log_fields, session_id=session_id or None)
+    else:
+        LogManager.enqueue_interaction(**log_fields, session_id=session_id or None)
     return {"processing_time_ms": processing_time_ms}
 
+async def alog_interaction(state: BankingAgentState) -> dict:
+    # Enqueueing blocks while the log queue is full (and a synchronous write blocks on the DB); keep that off the event loop
+    return await asyncio.to_thread(log_interaction, state)
+
 def escalation_handler(state: BankingAgentState) -> dict:
     """
     Escalate the interaction to a human agent.
     """
     return EscalationAgent.handle(state)
 
+async def aescalation_handler(state: BankingAgentState) -> dict:
+    return await EscalationAgent.ahandle(state)
+
+def emit_metrics(state: BankingAgentState) -> dict:
+    """
+    Emit per-message metrics. Runs in the same step as log_interaction (no data dependency between
+    them), so it adds no latency; it writes no state.
+    """
+    start_time = state.get("processing_start_time")
+    elapsed_ms = int((time.perf_counter() - start_time) * 1000) if start_time else -1
+    metrics_log.info(
+        "classified_type=%s confidence=%.2f source=%s agent=%s cache_hit=%s elapsed_ms=%d fast_classify_hit_rate=%.3f",
+        state.get("classified_type", ""), state.get("classification_confidence") or 0.0,
+        state.get("classification_source", ""), state.get("agent_name", ""), bool(state.get("cache_hit")), elapsed_ms,
+        fast_classify_hit_rate(),
+    )
+    return {}
+
+
+def _node(func, afunc):
+    """Graph node running ``func`` under invoke() and the coroutine ``afunc`` under ainvoke()."""
+    return RunnableLambda(func, afunc=afunc, name=func.__name__)
+
 
+@lru_cache(maxsize=1)
 def build_workflow():
+    """
+    Return the compiled banking support workflow, building it on the first call.
+    Every caller gets the same compiled graph; it keeps no per-run state, so sharing it is safe.
+    """
+    return _build_workflow_uncached()
+
+
+def _build_workflow_uncached():
     """
     Build and compile the banking support workflow with conditional routing.
 
@@ -270,53 +847,72 @@ def build_workflow():
 
     Note: Only positive and negative feedback handlers are implemented for now.
     """
-    print("\n🔧 Building workflow (positive and negative feedback handlers)...")
-
     workflow = StateGraph(BankingAgentState)
 
     # Add nodes
     workflow.add_node("validate_input", validate_input)
-    workflow.add_node("classify_message", classify_message)
-    workflow.add_node("escalation_handler", escalation_handler)
-    workflow.add_node("positive_feedback_handler", positive_feedback_handler)
-    workflow.add_node("negative_feedback_handler", negative_feedback_handler)
-    workflow.add_node("query_handler", query_handler)
-    workflow.add_node("format_response", format_response)
-    workflow.add_node("log_interaction", log_interaction)
+    workflow.add_node("check_response_cache", check_response_cache)
+    workflow.add_node("classify_message", _node(classify_message, aclassify_message))
+    workflow.add_node("escalation_handler", _node(escalation_handler, aescalation_handler))
+    workflow.add_node("positive_feedback_handler", _node(positive_feedback_handler, apositive_feedback_handler))
+    workflow.add_node("use_response_draft", use_response_draft)
+    workflow.add_node("negative_feedback_handler", _node(negative_feedback_handler, anegative_feedback_handler))
+    workflow.add_node("query_handler", _node(query_handler, aquery_handler))
+    workflow.add_node("format_response", _node(format_response, aformat_response))
+    workflow.add_node("log_interaction", _node(log_interaction, alog_interaction))
+    workflow.add_node("emit_metrics", emit_metrics)
 
     # Add regular edges (no branching)
     workflow.add_edge(START, "validate_input")
-    workflow.add_edge("validate_input", "classify_message")
+    workflow.add_edge("validate_input", "check_response_cache")
 
-    # Route by confidence first (low → escalation), then by classification type
+    # Repeated input → reuse the cached response, else classify
+    workflow.add_conditional_edges(
+        "check_response_cache",
+        route_after_cache,
+        {
+            "log_interaction": "log_interaction",
+            "emit_metrics": "emit_metrics",
+            "classify_message": "classify_message",
+        },
+    )
+
+    # Route by confidence first (low → escalation), then a drafted reply, then by classification type
     workflow.add_conditional_edges(
         "classify_message",
         route_after_classification,
         {
             "escalation_handler": "escalation_handler",
+            "use_response_draft": "use_response_draft",
             "positive_feedback_handler": "positive_feedback_handler",
             "negative_feedback_handler": "negative_feedback_handler",
             "query_handler": "query_handler",
         },
     )
 
-    # All handlers (including escalation) go through format_response then logging
+    # All handlers (including escalation) go through format_response, then fan out: the DB log write
+    # and metrics emission run in the same super-step (concurrently) and both end the run
     workflow.add_edge("positive_feedback_handler", "format_response")
+    workflow.add_edge("use_response_draft", "format_response")
     workflow.add_edge("negative_feedback_handler", "format_response")
     workflow.add_edge("query_handler", "format_response")
     workflow.add_edge("escalation_handler", "format_response")
     workflow.add_edge("format_response", "log_interaction")
+    workflow.add_edge("format_response", "emit_metrics")
     workflow.add_edge("log_interaction", END)
+    workflow.add_edge("emit_metrics", END)
 
     compiled = workflow.compile()
 
-    print("✅ Workflow built with positive feedback, negative feedback, and query handlers!")
-    print("   Flow: START -> validate -> classify -> [ROUTE] -> [HANDLER] -> END")
+    log.info("Workflow built: START -> validate -> classify -> [ROUTE] -> [HANDLER] -> format -> (log | metrics) -> END")
 
     return compiled
 
-def test_workflow():
-    """Test the workflow - currently only positive feedback handler is implemented."""
+def test_workflow(batch: bool = False):
+    """
+    Test the workflow - currently only positive feedback handler is implemented.
+    With ``batch`` only the classification step runs, through the OpenAI Batch API.
+    """
     print("\n" + "="*70)
     print("🧪 TESTING WORKFLOW (Positive Feedback Handler Only)")
     print("="*70)
@@ -352,13 +948,28 @@ def test_workflow():
     # If the ambiguous case doesn't trigger escalation (model returns confidence >= 0.7),
     # temporarily set CONFIDENCE_THRESHOLD = 0.95 at the top of this file to force escalation.
 
-    for i, test_case in enumerate(test_cases, 1):
+    if batch:
+        from workflow.batch_classify import classify_batch
+
+        classifications = classify_batch([
+            {"custom_id": str(i), "user_input": test_case["user_input"]}
+            for i, test_case in enumerate(test_cases)
+        ])
+        for i, test_case in enumerate(test_cases):
+            classified = classifications.get(str(i))
+            print(f"\n📦 {test_case['name']}: " + (
+                f"{classified[0]} ({classified[1]:.2f}) - {classified[2]}" if classified else "no result"
+            ))
+        return
+
+    # Run every case concurrently through the async nodes within the rate limits, then print the results in order
+    results = asyncio.run(parallel_map(workflow.ainvoke, test_cases))
+
+    for i, (test_case, result) in enumerate(zip(test_cases, results), 1):
         print(f"\n{'='*70}")
         print(f"Test Case {i}: {test_case['name']}")
         print(f"{'='*70}")
 
-        result = workflow.invoke(test_case)
-
         print(f"\n📤 RESULT:")
         print(f"   Classification: {result['classified_type']}")
         print(f"   Confidence: {result['classification_confidence']:.2f}")
@@ -372,4 +983,8 @@ def test_workflow():
     print("="*70)
 
 if __name__ == "__main__":
-    test_workflow()
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the banking support workflow test cases")
+    parser.add_argument("--batch", action="store_true", help="Classify the cases via the OpenAI Batch API (results within 24 h)")
+    test_workflow(batch=parser.parse_args().batch)
\ No newline at end of file